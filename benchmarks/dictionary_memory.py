@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""Measures the memory held by a dictionary loaded from a CC-CEDICT file.
+
+Usage:
+    python benchmarks/dictionary_memory.py [path/to/cedict_ts.u8]
+
+It compares the entries built by Dictionary with the layout used up to
+version 0.2.1 (one __dict__-backed object per script holding lists of
+strings), and with the compiled, memory-mapped format.
+"""
+
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from chinese.dictionary import Dictionary, Parser
+
+
+class LegacyResult:
+
+    def __init__(self, match, pinyin, definitions):
+        self.match = match
+        self.pinyin = pinyin
+        self.definitions = definitions
+
+def load_legacy(path):
+    traditional, simplified = {}, {}
+    with open(path, encoding='utf-8') as f:
+        for t, s, pinyin, definitions in Parser.parse_lines(f):
+            traditional.setdefault(t, []).append(LegacyResult(s, pinyin, definitions))
+            simplified.setdefault(s, []).append(LegacyResult(t, pinyin, definitions))
+    return traditional, simplified
+
+def load(path, **kwargs):
+    dictionary = Dictionary()
+    dictionary.load(path, **kwargs)
+    return dictionary
+
+def measure(name, function, *args, **kwargs):
+    gc.collect()
+    tracemalloc.start()
+    result = function(*args, **kwargs)
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print('{:<10} {:>8.1f} MB'.format(name, size / 1e6))
+    del result
+
+def main():
+    directory = os.path.join(os.path.dirname(__file__), '..', 'src', 'chinese', 'data')
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(directory, 'cedict_ts.u8')
+    measure('legacy', load_legacy, path)
+    measure('current', load, path, cache=False, workers=1)
+
+    # Mapped pages are shared with the page cache and not counted by tracemalloc.
+    with tempfile.TemporaryDirectory() as tmp:
+        compiled = os.path.join(tmp, 'cedict.bin')
+        load(path, cache=False, workers=1).compile(compiled)
+        measure('compiled', load, compiled)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""Builds the packaged dictionary files from a CC-CEDICT release.
+
+Usage:
+    python scripts/build_data.py [path/to/cedict_ts.u8]
+
+The file defaults to src/chinese/data/cedict_ts.u8. It writes, next to it,
+cedict.bin (the compiled dictionary that load() opens with mmap) and
+cedict.pickle (the fallback used when cedict.bin is missing or outdated).
+Run it before building a release whenever CC-CEDICT or the compiled
+format changes.
+"""
+
+import os
+import sys
+
+from chinese.dictionary import Dictionary
+
+
+def main():
+    data = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src', 'chinese', 'data')
+    data = os.path.normpath(data)
+    source = sys.argv[1] if len(sys.argv) > 1 else os.path.join(data, 'cedict_ts.u8')
+
+    dictionary = Dictionary()
+    dictionary.load(source, cache=False)
+    dictionary.compile(os.path.join(data, 'cedict.bin'))
+    dictionary.export(os.path.join(data, 'cedict.pickle'))
+    print('Wrote cedict.bin and cedict.pickle to {}'.format(data))
+
+
+if __name__ == '__main__':
+    main()
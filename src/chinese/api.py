@@ -1,24 +1,106 @@
 #!/usr/bin/env python
 # coding: utf-8
 
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+from multiprocessing import Pool, Process
+import os
 from pathlib import Path
 import platform
 import re
+import struct
 import subprocess
+import sys
+import threading
 
 from chinese.converter import Converter
-from chinese.dictionary import Dictionary
-from chinese.tokenizer import Tokenizer
+from chinese.dictionary import Dictionary, DictionaryRegistry, LookupResult
+from chinese.store import Store
+from chinese.tokenizer import Engine, Tokenizer
 import chinese.errors as errors
 
+logger = logging.getLogger(__name__)
+
 
 class ChineseAnalyzer:
 
-    def __init__(self):
+    def __init__(self, *, cache=None):
+        """
+        Args:
+            cache (ResultCache): A cache of parse results used by parse() for the
+                built-in engines. Results are keyed by the text, the script, the
+                engine and the identity of the loaded dictionary.
+        """
         self.dictionary = Dictionary()
-        self.dictionary.load()
         self.converter = Converter()
-        self.tokenizer = Tokenizer()
+        self.tokenizer = Tokenizer(dictionary=self.dictionary)
+        self.dictionaries = DictionaryRegistry(self.dictionary)
+        self.cache = cache
+        self.__reloader = None
+        self.__reload_lock = threading.Lock()
+
+    def warmup(self, *, traditional=False, using=Tokenizer.jieba):
+        """Loads the dictionary and initializes the tokenizer up front.
+
+        Both are otherwise loaded on first use, which keeps `import chinese` and
+        ChineseAnalyzer() fast. Long-running servers can call this at startup
+        so that the first parse does not pay the loading cost.
+
+        Args:
+            traditional (bool): If set to True, the Traditional Chinese tokenizer
+                dictionary is prepared.
+            using: An Engine object or a custom tokenizer derived from TokenizerInterface.
+        """
+        self.dictionary.warmup()
+        self.tokenizer.warmup(traditional=traditional, using=using)
+
+    def reload(self, path=None, *, wait=True):
+        """Loads a dictionary and replaces the analyzer's with it.
+
+        The new dictionary is loaded and its maximum matchers are built before it
+        is published with one assignment, so parse() calls in flight keep using
+        the dictionary they started with, and later calls use the new one without
+        waiting. A CC-CEDICT formatted file is parsed and compiled in a separate
+        process, then mapped into this one.
+
+        Args:
+            path (str): A path to a CC-CEDICT formatted file or a compiled dictionary.
+                If None, the default dictionary is loaded.
+            wait (bool): If set to False, the dictionary is loaded in a background
+                thread and a Future of it is returned.
+
+        Returns:
+            The new Dictionary object, or a Future of it if wait is set to False.
+        """
+        if wait:
+            return self.__reload(path)
+        with self.__reload_lock:
+            if self.__reloader is None:
+                self.__reloader = ThreadPoolExecutor(max_workers=1, thread_name_prefix='chinese-reload')
+            return self.__reloader.submit(self.__reload, path)
+
+    def __reload(self, path):
+        logger.info('Reloading the dictionary.')
+        if path is not None and not Store.is_compiled(path):
+            # Writes the compiled cache, so loading it below only maps the file. The process
+            # is not a daemon like those of a Pool, so that it may parse over a Pool itself.
+            process = Process(target=_compile_dictionary, args=(path,), name='chinese-compile')
+            process.start()
+            process.join()
+            if process.exitcode != 0:
+                logger.warning('Could not compile {} in a separate process.'.format(path))
+        dictionary = Dictionary()
+        dictionary.load(path)
+        self.tokenizer.prepare(dictionary)
+        with self.__reload_lock:
+            self.dictionary = dictionary
+            self.tokenizer.dictionary = dictionary
+            self.dictionaries.base = dictionary
+        return dictionary
 
     def parse(self, string, *, traditional=False, using=Tokenizer.jieba, dictionary=None):
         """Returns a ChineseAnalyzerResult object.
@@ -28,30 +110,257 @@ class ChineseAnalyzer:
             traditional (bool): If set to True, the string will be parsed as a Traditional
                 Chinese text.
             using: An Engine object or a custom tokenizer derived from TokenizerInterface.
-            dictionary (str): A path to your dictionary file.
+            dictionary (str): The name of a stack registered in `dictionaries`, or a path
+                to your dictionary file. Its entries take precedence over the default
+                dictionary's. A path is registered as a stack named after it on first use.
         """
-        tokens = self.tokenizer.tokenize(string, traditional=traditional, using=using)
-        if dictionary is not None:
-            self.dictionary.load(dictionary)
-        if traditional:
-            lookup = self.dictionary.lookup_with_traditional_chinese
+        if dictionary is None:
+            dictionary = self.dictionary
         else:
-            lookup = self.dictionary.lookup_with_simplified_chinese
-        parsed_tokens = map(lookup, (token[0] for token in tokens))
-        parsed_string = list(zip(tokens, parsed_tokens))
-        return ChineseAnalyzerResult(self, tokens, parsed_string, traditional)
+            if dictionary not in self.dictionaries:
+                self.dictionaries.register(dictionary, dictionary)
+            dictionary = self.dictionaries.get(dictionary)
+        if self.cache is None or not isinstance(using, Engine):
+            parsed = _analyze(self, string, traditional, using, dictionary)
+            return ChineseAnalyzerResult(self, parsed, traditional, dictionary=dictionary)
+
+        key = self.cache.key('result-v{}'.format(_RESULT_VERSION), string, str(traditional), using.name,
+                             dictionary.identity)
+        data = self.cache.get(key)
+        if data is not None:
+            try:
+                return ChineseAnalyzerResult.from_bytes(self, data, dictionary=dictionary)
+            except errors.InvalidResultError:
+                logger.warning('Ignoring a broken cached result.')
+        parsed = _analyze(self, string, traditional, using, dictionary)
+        result = ChineseAnalyzerResult(self, parsed, traditional, dictionary=dictionary)
+        self.cache.put(key, result.to_bytes())
+        return result
+
+    def convert(self, text, *, to='simplified'):
+        """Converts a text between Traditional and Simplified Chinese.
+
+        Args:
+            text (str): A Chinese text.
+            to (str): 'simplified' or 'traditional'.
+        """
+        return self.dictionary.convert(text, to=to)
+
+    def convert_stream(self, stream, *, to='simplified', max_length=65536):
+        """Converts a text of any size between Traditional and Simplified Chinese.
+
+        Args:
+            stream: An iterable of strings, or a file object.
+            to (str): 'simplified' or 'traditional'.
+            max_length (int): The maximum number of characters converted at a time.
+
+        Yields:
+            Converted strings, which make up the whole converted text.
+        """
+        return self.dictionary.script_converter(to=to).convert_stream(stream, max_length)
+
+    def parse_many(self, texts, *, traditional=False, using=Tokenizer.jieba, workers=None,
+                   chunksize=64, ordered=True):
+        """Parses many texts over a pool of worker processes.
+
+        Each worker loads the dictionary once, from its file, replaying the edits
+        which are not in its journal, and parses the texts sent to it in chunks.
+        This is a generator; the pool is started on the first iteration and shut
+        down when the generator is exhausted or closed.
+
+        Args:
+            texts: An iterable of Chinese texts.
+            traditional (bool): If set to True, the texts will be parsed as Traditional
+                Chinese texts.
+            using: An Engine object or a custom tokenizer derived from TokenizerInterface.
+                A custom tokenizer must be picklable to be sent to the workers.
+            workers (int): The number of worker processes. Defaults to the number of CPUs.
+                If set to 1, the texts are parsed in this process.
+            chunksize (int): The number of texts sent to a worker at a time.
+            ordered (bool): If set to True, the results are yielded in input order.
+                Otherwise, (index, result) pairs are yielded as they complete.
+
+        Yields:
+            ChineseAnalyzerResult objects, or (index, ChineseAnalyzerResult) pairs
+            if ordered is set to False.
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers == 1:
+            for index, string in enumerate(texts):
+                result = self.parse(string, traditional=traditional, using=using)
+                yield result if ordered else (index, result)
+            return
+
+        dictionary = self.dictionary
+        initargs = (dictionary.path, dictionary.unjournaled_edits(), traditional, using)
+        with Pool(workers, initializer=_init_worker, initargs=initargs) as pool:
+            if ordered:
+                for _, parsed in pool.imap(_parse_in_worker, enumerate(texts), chunksize):
+                    yield ChineseAnalyzerResult(self, parsed, traditional, dictionary=dictionary)
+            else:
+                for index, parsed in pool.imap_unordered(_parse_in_worker, enumerate(texts), chunksize):
+                    yield index, ChineseAnalyzerResult(self, parsed, traditional, dictionary=dictionary)
+
+    def parse_stream(self, stream, *, traditional=False, using=Tokenizer.jieba, max_length=65536):
+        """Parses a text of any size paragraph by paragraph.
+
+        The stream is read incrementally and split at newlines, so memory usage
+        does not depend on the size of the input. A paragraph longer than
+        max_length is split at its last sentence delimiter within that length,
+        or at max_length if there is none. Blank paragraphs are skipped.
+
+        Args:
+            stream: A file object opened in text mode or an iterable of strings.
+                The strings do not need to end at paragraph boundaries.
+            traditional (bool): If set to True, the text will be parsed as a Traditional
+                Chinese text.
+            using: An Engine object or a custom tokenizer derived from TokenizerInterface.
+            max_length (int): The maximum number of characters parsed at a time.
+
+        Yields:
+            A ChineseAnalyzerResult object per paragraph. Its offset attribute is the
+            position of the paragraph in the whole text. With jieba and cedict, token
+            positions are also relative to the whole text.
+        """
+        for offset, paragraph in _split_stream(stream, max_length):
+            if not paragraph.strip():
+                continue
+            parsed = _analyze(self, paragraph, traditional, using)
+            if using in (Tokenizer.jieba, Tokenizer.cedict) and parsed.details is None:
+                parsed = parsed._replace(shift=parsed.shift + offset)
+            yield ChineseAnalyzerResult(self, parsed, traditional, offset=offset)
+
+def _split_stream(stream, max_length):
+    """Yields (offset, paragraph) pairs read incrementally from the stream."""
+    if hasattr(stream, 'read'):
+        read = stream.read
+        stream = iter(lambda: read(max_length), '')
+
+    delimiters = re.compile('[。？！；]')
+    def cut(text):
+        """Returns the length of the first piece of a text longer than max_length."""
+        boundaries = [m.end() for m in delimiters.finditer(text, 0, max_length)]
+        return boundaries[-1] if boundaries else max_length
+
+    offset, buffer = 0, ''
+    for chunk in stream:
+        buffer += chunk
+        *paragraphs, buffer = buffer.split('\n')
+        for paragraph in paragraphs:
+            while len(paragraph) > max_length:
+                length = cut(paragraph)
+                yield offset, paragraph[:length]
+                offset += length
+                paragraph = paragraph[length:]
+            yield offset, paragraph
+            offset += len(paragraph) + 1
+        while len(buffer) > max_length:
+            length = cut(buffer)
+            yield offset, buffer[:length]
+            offset += length
+            buffer = buffer[length:]
+    if buffer:
+        yield offset, buffer
+
+# A parsed text in columns. The tokens are ids into the vocabulary, which lists the
+# distinct tokens in order of appearance with their lookup results. Token i spans
+# text[boundaries[i]:boundaries[i + 1]]. details holds the tokens as returned by the
+# tokenizer, or None if they are (token, start, end) tuples with positions equal to
+# the boundaries plus shift.
+Parsed = namedtuple('Parsed', ['text', 'boundaries', 'ids', 'vocabulary', 'lookups', 'details', 'shift'])
+
+# The header of ChineseAnalyzerResult.to_bytes(): magic, version, flags, offset, shift,
+# token count, and the lengths of the text and of the JSON metadata in bytes.
+_RESULT_HEADER = struct.Struct('<4sBB2xQqIII')
+_RESULT_MAGIC = b'CNPR'
+_RESULT_VERSION = 1
+
+def _analyze(analyzer, string, traditional, using, dictionary=None):
+    """Tokenizes the string and looks up each distinct token in the dictionary,
+    which defaults to the analyzer's."""
+    if dictionary is None:
+        dictionary = analyzer.dictionary
+    tokens = analyzer.tokenizer.tokenize(string, traditional=traditional, using=using, dictionary=dictionary)
+    if traditional:
+        lookup = dictionary.lookup_with_traditional_chinese
+    else:
+        lookup = dictionary.lookup_with_simplified_chinese
+
+    vocabulary = {}
+    ids = array('I')
+    boundaries = array('I', [0])
+    for token in tokens:
+        word = token[0]
+        i = vocabulary.get(word)
+        if i is None:
+            i = vocabulary[word] = len(vocabulary)
+        ids.append(i)
+        boundaries.append(boundaries[-1] + len(word))
+
+    # Only (word, start, end) tokens are derived; custom tokenizers may return e.g. (word, tag, name).
+    def positioned(token):
+        return len(token) == 3 and isinstance(token[1], int) and isinstance(token[2], int)
+    shift = tokens[0][1] if tokens and positioned(tokens[0]) else 0
+    derived = all(
+        positioned(token) and token[1] == boundaries[i] + shift and token[2] == boundaries[i + 1] + shift
+        for i, token in enumerate(tokens)
+    )
+    return Parsed(
+        text=''.join(token[0] for token in tokens),
+        boundaries=boundaries,
+        ids=ids,
+        vocabulary=list(vocabulary),
+        lookups=[lookup(word) for word in vocabulary],
+        details=None if derived else list(tokens),
+        shift=shift if derived else 0,
+    )
+
+def _compile_dictionary(path):
+    Dictionary().load(path)
+
+# The analyzer owned by a parse_many worker process, with its parse options.
+_worker = None
+
+def _init_worker(dictionary_path, edits, traditional, using):
+    global _worker
+    analyzer = ChineseAnalyzer()
+    if dictionary_path is not None:
+        analyzer.dictionary.load(dictionary_path)
+    if edits:
+        analyzer.dictionary.replay_edits(edits)
+    analyzer.warmup(traditional=traditional, using=using)
+    _worker = (analyzer, traditional, using)
+
+def _parse_in_worker(item):
+    index, string = item
+    analyzer, traditional, using = _worker
+    return index, _analyze(analyzer, string, traditional, using)
 
 class ChineseAnalyzerResult:
+    """The result of parsing a text.
+
+    The original text, its paragraph and sentence spans and the index from tokens
+    to sentences are computed once, when they are first needed. Offsets are
+    relative to original(); add `offset` for offsets in a stream.
+    """
+
+    sentence = re.compile('[^。？！；]+')
     
-    def __init__(self, parent, tokens, parsed_string, traditional):
+    def __init__(self, parent, parsed, traditional, *, offset=0, dictionary=None):
         self.__parent = parent
-        self.__tokens = tokens
-        self.__parsed_string = parsed_string
+        self.__dictionary = parent.dictionary if dictionary is None else dictionary
+        self.__parsed = parsed
         self.__traditional = traditional
+        self.offset = offset
+        self.__paragraph_spans = None
+        self.__sentence_spans = None
+        self.__token_sentences = None
+        self.__token_positions = None
 
     def original(self):
         """Returns the provided string as is."""
-        return ''.join(token[0] for token in self.__tokens)
+        return self.__parsed.text
 
     def tokens(self, *, details=False, unique=False):
         """Returns tokens in the provided text.
@@ -65,41 +374,134 @@ class ChineseAnalyzerResult:
             A list of tokens are returned by defulat. If details is set to True,
             a list of tuples containing tokens and their details are returned.
         """
-        result = [token for token in self.__tokens] if details else [token[0] for token in self.__tokens]
+        if unique and not details:
+            return list(self.__parsed.vocabulary)
+        result = self.__details() if details else self.__words()
         if unique:
             from collections import OrderedDict
             result = list(OrderedDict.fromkeys(result))
         
         return result
     
+    def __words(self):
+        vocabulary = self.__parsed.vocabulary
+        return [vocabulary[i] for i in self.__parsed.ids]
+
+    def __details(self):
+        parsed = self.__parsed
+        if parsed.details is not None:
+            return list(parsed.details)
+        words, boundaries, shift = self.__words(), parsed.boundaries, parsed.shift
+        return [(word, boundaries[i] + shift, boundaries[i + 1] + shift) for i, word in enumerate(words)]
+
     def freq(self):
         """Returns a Counter object that counts the number of occurrences for each token."""
         from collections import Counter
-        return Counter(self.tokens())
+        return Counter({token: len(positions) for token, positions in self.__positions().items()})
 
-    def paragraphs(self):
-        """Returns a list of paragraphs in a provided text."""
-        delimeter = '\n'
-        
-        naive_strip_result = self.original().split(delimeter)
-        paragraphs_cleaned = [paragraph.strip() for paragraph in naive_strip_result if paragraph]
+    def positions(self, token):
+        """Returns the indexes at which the token occurs in tokens(), in ascending order."""
+        return list(self.__positions().get(token, []))
 
-        return paragraphs_cleaned
+    def __positions(self):
+        """Returns a dict mapping tokens, in order of appearance, to their positions."""
+        if self.__token_positions is None:
+            positions = [array('I') for _ in self.__parsed.vocabulary]
+            for i, word in enumerate(self.__parsed.ids):
+                positions[word].append(i)
+            self.__token_positions = dict(zip(self.__parsed.vocabulary, positions))
+        return self.__token_positions
 
-    def sentences(self):
-        """Returns a list of sentences in a provided text."""
-        result = []
-        delimiters = re.compile('[。？！；]')
-        paragraphs = self.paragraphs()
-        
-        for paragraph in paragraphs:
-            result += [sentence for sentence in delimiters.split(paragraph) if sentence]
-        
-        return result
+    def paragraphs(self, *, offsets=False):
+        """Returns a list of paragraphs in a provided text.
+
+        Args:
+            offsets (bool): If set to True, (paragraph, start, end) tuples are returned.
+        """
+        return self.__spans(self.__paragraphs(), offsets)
+
+    def sentences(self, *, offsets=False):
+        """Returns a list of sentences in a provided text.
+
+        Args:
+            offsets (bool): If set to True, (sentence, start, end) tuples are returned.
+        """
+        return self.__spans(self.__sentences(), offsets)
     
-    def search(self, string):
-        """Returns a list of sentences containing the argument string."""
-        return [sentence for sentence in self.sentences() if string in sentence]
+    def search(self, string, *, offsets=False, token=False):
+        """Returns a list of sentences containing the argument string.
+
+        Args:
+            offsets (bool): If set to True, (sentence, start, end) tuples are returned.
+            token (bool): If set to True, only sentences containing the string as a
+                token are returned.
+        """
+        starts, ends = self.__sentences()
+        if token:
+            found = self.__sentences_of_tokens().get(string, [])
+        elif not string:
+            found = range(len(starts))
+        else:
+            original = self.original()
+            found = []
+            i = original.find(string)
+            while i >= 0:
+                k = bisect_right(starts, i) - 1
+                if k >= 0 and i + len(string) <= ends[k]:
+                    found.append(k)
+                    i = original.find(string, ends[k])
+                else:
+                    i = original.find(string, i + 1)
+        return self.__spans((array('I', (starts[k] for k in found)), array('I', (ends[k] for k in found))), offsets)
+
+    def __spans(self, spans, offsets):
+        original = self.original()
+        if offsets:
+            return [(original[start:end], start, end) for start, end in zip(*spans)]
+        return [original[start:end] for start, end in zip(*spans)]
+
+    def __paragraphs(self):
+        """Returns the start and end offsets of the paragraphs, without surrounding spaces."""
+        if self.__paragraph_spans is None:
+            starts, ends = array('I'), array('I')
+            start = 0
+            for line in self.original().split('\n'):
+                end = start + len(line)
+                if line:
+                    stripped_start = end - len(line.lstrip())
+                    stripped_end = max(start + len(line.rstrip()), stripped_start)
+                    starts.append(stripped_start)
+                    ends.append(stripped_end)
+                start = end + 1
+            self.__paragraph_spans = starts, ends
+        return self.__paragraph_spans
+
+    def __sentences(self):
+        """Returns the start and end offsets of the sentences."""
+        if self.__sentence_spans is None:
+            original = self.original()
+            starts, ends = array('I'), array('I')
+            for start, end in zip(*self.__paragraphs()):
+                for match in self.sentence.finditer(original, start, end):
+                    starts.append(match.start())
+                    ends.append(match.end())
+            self.__sentence_spans = starts, ends
+        return self.__sentence_spans
+
+    def __sentences_of_tokens(self):
+        """Returns a dict mapping tokens to the sorted indexes of the sentences containing them."""
+        if self.__token_sentences is None:
+            starts, ends = self.__sentences()
+            vocabulary, boundaries = self.__parsed.vocabulary, self.__parsed.boundaries
+            index = {}
+            for i, word in enumerate(self.__parsed.ids):
+                k = bisect_right(starts, boundaries[i]) - 1
+                if k >= 0 and boundaries[i + 1] <= ends[k]:
+                    found = index.setdefault(vocabulary[word], [])
+                    if not found or found[-1] != k:
+                        found.append(k)
+            self.__token_sentences = index
+        return self.__token_sentences
 
     def pinyin(self, *, force=False, all_readings=False):
         """Returns a pinyin representation of the provided text.
@@ -126,15 +528,14 @@ class ChineseAnalyzerResult:
             A list of pinyins like [['wǒ'], ['shì'], ['Rìběnrén']]. If some tokens have
             several readings, the corresponding list looks like ['de', 'dī', 'dí', 'dì'].
         """
-        lists = []
-        converter = self.__parent.converter.prettify
+        vocabulary = []
         if self.__traditional:
-            lookup_pinyin = self.__parent.dictionary.lookup_pinyin_with_traditional_chinese
+            lookup_pinyin = self.__dictionary.lookup_character_pinyin_with_traditional_chinese
         else:
-            lookup_pinyin = self.__parent.dictionary.lookup_pinyin_with_simplified_chinese
+            lookup_pinyin = self.__dictionary.lookup_character_pinyin_with_simplified_chinese
         
-        for parsed in self.__parsed_string:
-            lookup_results = parsed[1]
+        # Each distinct token is converted once.
+        for lookup_results in self.__parsed.lookups:
             pinyins = []
             
             for result in lookup_results:
@@ -142,17 +543,16 @@ class ChineseAnalyzerResult:
                     continue
 
                 if result.pinyin is not None:
-                    pinyins.append(''.join(converter(ugly_pinyin) for ugly_pinyin in result.pinyin))
+                    pinyins.append(result.pinyin_marks)
                 else:
                     if force:
-                        joined = ''.join(lookup_pinyin(char) for char in result.match)
-                        pinyins.append(joined)
+                        pinyins.append(lookup_pinyin(result.match))
                     else:
                         pinyins.append(result.match)
             
-            lists.append(pinyins)
+            vocabulary.append(pinyins)
         
-        return lists
+        return [vocabulary[i] for i in self.__parsed.ids]
     
     def __join(self, pinyin_list, all_readings=False):
         def remove_duplicates_from_list(l):
@@ -215,33 +615,157 @@ class ChineseAnalyzerResult:
             'original': self.original(),
             'parsed': [{
                 'token': parsed[0],
-                'dict_data': [eval(str(d)) for d in parsed[1]]
-            } for parsed in self.__parsed_string]
+                'dict_data': [d.to_dict() for d in parsed[1]]
+            } for parsed in self.__parsed_tokens()]
         }
         
         return pformat(data)
+
+    def to_dict(self):
+        """Returns a dict of built-in types describing the result, restored by from_dict()."""
+        parsed = self.__parsed
+        return {
+            'original': parsed.text,
+            'traditional': self.__traditional,
+            'offset': self.offset,
+            'boundaries': parsed.boundaries.tolist(),
+            'ids': parsed.ids.tolist(),
+            'vocabulary': list(parsed.vocabulary),
+            'lookups': [[result.to_dict() for result in results] for results in parsed.lookups],
+            'details': None if parsed.details is None else list(parsed.details),
+            'shift': parsed.shift,
+        }
+
+    @classmethod
+    def from_dict(cls, analyzer, data, *, dictionary=None):
+        """Returns the result described by a dict returned by to_dict().
+
+        Args:
+            analyzer (ChineseAnalyzer): The analyzer used by methods like pinyin().
+            data (dict): A dict returned by to_dict().
+            dictionary (Dictionary): The dictionary used by pinyin(force=True).
+                Defaults to the analyzer's.
+        """
+        try:
+            parsed = Parsed(
+                text=data['original'],
+                boundaries=array('I', data['boundaries']),
+                ids=array('I', data['ids']),
+                vocabulary=list(data['vocabulary']),
+                lookups=[[LookupResult.from_dict(d) for d in results] for results in data['lookups']],
+                details=None if data['details'] is None else [tuple(d) for d in data['details']],
+                shift=data['shift'],
+            )
+            traditional, offset = data['traditional'], data['offset']
+        except (KeyError, TypeError, ValueError, OverflowError, errors.Error) as e:
+            raise errors.InvalidResultError('InvalidResultError: {}'.format(e))
+        if len(parsed.boundaries) != len(parsed.ids) + 1 or len(parsed.lookups) != len(parsed.vocabulary) or \
+                parsed.boundaries[-1] != len(parsed.text) or any(i >= len(parsed.vocabulary) for i in parsed.ids):
+            raise errors.InvalidResultError('InvalidResultError: inconsistent columns')
+        return cls(analyzer, parsed, traditional, offset=offset, dictionary=dictionary)
+
+    def to_json(self, **kwargs):
+        """Returns the result as a JSON string. Keyword arguments are passed to json.dumps()."""
+        return json.dumps(self.to_dict(), ensure_ascii=False, **kwargs)
+
+    @classmethod
+    def from_json(cls, analyzer, string, *, dictionary=None):
+        """Returns the result described by a string returned by to_json()."""
+        try:
+            data = json.loads(string)
+        except ValueError as e:
+            raise errors.InvalidResultError('InvalidResultError: {}'.format(e))
+        return cls.from_dict(analyzer, data, dictionary=dictionary)
+
+    def to_bytes(self):
+        """Returns the result in a compact binary form, restored by from_bytes().
+
+        Token boundaries and ids are stored as little-endian uint32 arrays. The
+        vocabulary, its lookup results and token details are stored as JSON, so
+        details must be JSON serializable.
+        """
+        parsed = self.__parsed
+        boundaries, ids = array('I', parsed.boundaries), array('I', parsed.ids)
+        if sys.byteorder == 'big':
+            boundaries.byteswap()
+            ids.byteswap()
+        text = parsed.text.encode('utf-8')
+        meta = json.dumps({
+            'vocabulary': parsed.vocabulary,
+            'lookups': [[result.to_dict() for result in results] for results in parsed.lookups],
+            'details': parsed.details,
+        }, ensure_ascii=False).encode('utf-8')
+        flags = (1 if self.__traditional else 0) | (2 if parsed.details is not None else 0)
+        header = _RESULT_HEADER.pack(_RESULT_MAGIC, _RESULT_VERSION, flags, self.offset, parsed.shift,
+                                     len(ids), len(text), len(meta))
+        return b''.join([header, boundaries.tobytes(), ids.tobytes(), text, meta])
+
+    @classmethod
+    def from_bytes(cls, analyzer, data, *, dictionary=None):
+        """Returns the result described by bytes returned by to_bytes()."""
+        data = memoryview(data)
+        try:
+            magic, version, flags, offset, shift, count, text_length, meta_length = \
+                _RESULT_HEADER.unpack_from(data, 0)
+        except struct.error as e:
+            raise errors.InvalidResultError('InvalidResultError: {}'.format(e))
+        start = _RESULT_HEADER.size
+        end = start + (2 * count + 1) * 4 + text_length + meta_length
+        if magic != _RESULT_MAGIC or version != _RESULT_VERSION or len(data) != end:
+            raise errors.InvalidResultError('InvalidResultError: unsupported or truncated data')
+
+        boundaries = array('I', bytes(data[start:start + (count + 1) * 4]))
+        start += (count + 1) * 4
+        ids = array('I', bytes(data[start:start + count * 4]))
+        start += count * 4
+        if sys.byteorder == 'big':
+            boundaries.byteswap()
+            ids.byteswap()
+        try:
+            text = bytes(data[start:start + text_length]).decode('utf-8')
+            meta = json.loads(bytes(data[start + text_length:end]).decode('utf-8'))
+            if not isinstance(meta, dict):
+                raise TypeError('metadata must be an object')
+            result = {
+                'original': text,
+                'traditional': bool(flags & 1),
+                'offset': offset,
+                'boundaries': boundaries,
+                'ids': ids,
+                'vocabulary': meta['vocabulary'],
+                'lookups': meta['lookups'],
+                'details': meta['details'] if flags & 2 else None,
+                'shift': shift,
+            }
+        except (KeyError, TypeError, ValueError) as e:
+            raise errors.InvalidResultError('InvalidResultError: {}'.format(e))
+        return cls.from_dict(analyzer, result, dictionary=dictionary)
     
     def pprint(self):
         """Prints a formatted description of the object."""
         print(self.pformat())
 
+    def __parsed_tokens(self):
+        """Returns (token, lookup results) pairs like tokenizers and dictionaries return them."""
+        lookups = self.__parsed.lookups
+        return list(zip(self.__details(), (lookups[i] for i in self.__parsed.ids)))
+
     def __len__(self):
         """Returns the number of tokens in the provided text."""
-        return len(self.__tokens)
+        return len(self.__parsed.ids)
 
     def __contains__(self, key):
         """Returns whether the key is in the tokens or not."""
-        return any(key == token[0] for token in self.__tokens)
+        return isinstance(key, str) and key in self.__positions()
 
     def __getitem__(self, key):
         """Returns a list of lookup results."""
-        if key not in self.tokens():
+        positions = self.__positions().get(key) if isinstance(key, str) else None
+        if positions is None:
             raise errors.InvalidKeyError('InvalidKeyError: {}'.format(key))
-        for token, dict_data in self.__parsed_string:
-            if key == token[0]:
-                return dict_data
+        return self.__parsed.lookups[self.__parsed.ids[positions[0]]]
 
     def __str__(self):
         from pprint import pformat
-        data = {parsed[0][0]: [eval(str(d)) for d in parsed[1]] for parsed in self.__parsed_string}
+        data = {parsed[0][0]: [d.to_dict() for d in parsed[1]] for parsed in self.__parsed_tokens()}
         return pformat(data)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from collections import OrderedDict, namedtuple
+import hashlib
+import os
+import threading
+
+
+CacheStats = namedtuple('CacheStats', ['hits', 'misses', 'disk_hits', 'evictions', 'entries', 'bytes'])
+
+class ResultCache:
+    """A bounded LRU cache of serialized parse results, with an optional on-disk tier.
+
+    Values are bytes, such as those returned by ChineseAnalyzerResult.to_bytes().
+    The in-memory tier holds at most max_entries values and max_bytes bytes,
+    evicting the least recently used first. If a directory is given, values are
+    also written there, one file per key, and read back on in-memory misses,
+    so they survive restarts; the least recently written files are removed when
+    the directory holds more than max_disk_bytes.
+    """
+
+    def __init__(self, *, max_entries=1024, max_bytes=64 << 20, directory=None, max_disk_bytes=1 << 30):
+        """
+        Args:
+            max_entries (int): The maximum number of values kept in memory.
+            max_bytes (int): The maximum total size of the values kept in memory.
+            directory (str): A directory for the on-disk tier, such as
+                chinese.store.cache_directory('results'). If None, nothing is written.
+            max_disk_bytes (int): The maximum total size of the on-disk tier.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.__entries = OrderedDict()
+        self.__bytes = 0
+        self.__hits = self.__misses = self.__disk_hits = self.__evictions = 0
+        self.__lock = threading.Lock()
+        self.__disk_bytes = None
+
+    @staticmethod
+    def key(*parts):
+        """Returns a key made of the SHA-256 hash of the given strings."""
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\x00')
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Returns the value of the key, or None."""
+        with self.__lock:
+            value = self.__entries.get(key)
+            if value is not None:
+                self.__entries.move_to_end(key)
+                self.__hits += 1
+                return value
+
+        value = self.__read(key) if self.directory is not None else None
+        with self.__lock:
+            if value is None:
+                self.__misses += 1
+                return None
+            self.__disk_hits += 1
+            self.__insert(key, value)
+        return value
+
+    def put(self, key, value):
+        """Stores the value of the key in memory, and on disk if a directory is set."""
+        with self.__lock:
+            self.__insert(key, value)
+        if self.directory is not None:
+            self.__write(key, value)
+
+    def __insert(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        previous = self.__entries.pop(key, None)
+        if previous is not None:
+            self.__bytes -= len(previous)
+        self.__entries[key] = value
+        self.__bytes += len(value)
+        while len(self.__entries) > self.max_entries or self.__bytes > self.max_bytes:
+            _, evicted = self.__entries.popitem(last=False)
+            self.__bytes -= len(evicted)
+            self.__evictions += 1
+
+    def clear(self):
+        """Empties the in-memory tier and resets the statistics. The on-disk tier is kept."""
+        with self.__lock:
+            self.__entries.clear()
+            self.__bytes = 0
+            self.__hits = self.__misses = self.__disk_hits = self.__evictions = 0
+
+    def stats(self):
+        """Returns a CacheStats of the hits, misses, hits on disk, evictions and in-memory usage."""
+        with self.__lock:
+            return CacheStats(self.__hits, self.__misses, self.__disk_hits, self.__evictions,
+                              len(self.__entries), self.__bytes)
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.bin')
+
+    def __read(self, key):
+        try:
+            with open(self.__path(key), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def __write(self, key, value):
+        path = self.__path(key)
+        tmp = '{}.{}.{}.tmp'.format(path, os.getpid(), threading.get_ident())
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp, 'wb') as f:
+                f.write(value)
+            os.replace(tmp, path)
+        except OSError:
+            return
+        with self.__lock:
+            if self.__disk_bytes is None:
+                self.__disk_bytes = sum(size for _, _, size in self.__files())
+            else:
+                self.__disk_bytes += len(value)
+            if self.__disk_bytes > self.max_disk_bytes:
+                self.__prune()
+
+    def __files(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith('.bin'):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield stat.st_mtime, path, stat.st_size
+
+    def __prune(self):
+        """Removes the oldest files until the on-disk tier is within 90% of its limit."""
+        files = sorted(self.__files())
+        total = sum(size for _, _, size in files)
+        for _, path, size in files:
+            if total <= self.max_disk_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        self.__disk_bytes = total
@@ -1,29 +1,135 @@
 #!/usr/bin/env python
 # coding: utf-8
 
+import re
+
 import chinese.errors as errors
 
 
 class Converter:
-    
+    """Converts pinyin between tone numbers and tone marks.
+
+    Every standard syllable with each of the five tones, lowercase or
+    capitalized, is converted once into a table shared by all instances.
+    Other strings fall back to the rule-based conversion.
+    """
+
     toned_vowels = {
         'a': {1: 'ā', 2: 'á', 3: 'ǎ', 4: 'à'},
         'e': {1: 'ē', 2: 'é', 3: 'ě', 4: 'è'},
         'i': {1: 'ī', 2: 'í', 3: 'ǐ', 4: 'ì'},
         'o': {1: 'ō', 2: 'ó', 3: 'ǒ', 4: 'ò'},
         'u': {1: 'ū', 2: 'ú', 3: 'ǔ', 4: 'ù'},
-        'A': {1: 'Ā', 2: 'Á', 3: 'Ǎ', 4: 'À'},
+        'A': {1: 'Ā', 2: 'Á', 3: 'Ǎ', 4: 'À'},
         'E': {1: 'Ē', 2: 'É', 3: 'Ě', 4: 'È'},
         'I': {1: 'Ī', 2: 'Í', 3: 'Ǐ', 4: 'Ì'},
         'O': {1: 'Ō', 2: 'Ó', 3: 'Ǒ', 4: 'Ò'},
         'U': {1: 'Ū', 2: 'Ú', 3: 'Ǔ', 4: 'Ù'},
     }
     tones = [1, 2, 3, 4]
+    toned_vowels_decomposed = {toned: (vowel, tone)
+                               for vowel, toned_vowel in toned_vowels.items()
+                               for tone, toned in toned_vowel.items()}
+
+    syllables = '''
+        a ai an ang ao ba bai ban bang bao bei ben beng bi bian biao bie bin bing bo bu
+        ca cai can cang cao ce cen ceng cha chai chan chang chao che chen cheng chi
+        chong chou chu chua chuai chuan chuang chui chun chuo ci cong cou cu cuan cui
+        cun cuo da dai dan dang dao de dei den deng di dia dian diao die ding diu dong
+        dou du duan dui dun duo e ei en eng er fa fan fang fei fen feng fo fou fu ga
+        gai gan gang gao ge gei gen geng gong gou gu gua guai guan guang gui gun guo
+        ha hai han hang hao he hei hen heng hm hng hong hou hu hua huai huan huang hui
+        hun huo ji jia jian jiang jiao jie jin jing jiong jiu ju juan jue jun ka kai
+        kan kang kao ke kei ken keng kong kou ku kua kuai kuan kuang kui kun kuo la lai
+        lan lang lao le lei leng li lia lian liang liao lie lin ling liu lo long lou lu
+        luan lun luo m ma mai man mang mao me mei men meng mi mian miao mie min ming
+        miu mo mou mu n na nai nan nang nao ne nei nen neng ng ni nian niang niao nie
+        nin ning niu nong nou nu nuan nuo o ou pa pai pan pang pao pei pen peng pi pian
+        piao pie pin ping po pou pu qi qia qian qiang qiao qie qin qing qiong qiu qu
+        quan que qun r ran rang rao re ren reng ri rong rou ru rua ruan rui run ruo sa
+        sai san sang sao se sen seng sha shai shan shang shao she shei shen sheng shi
+        shou shu shua shuai shuan shuang shui shun shuo si song sou su suan sui sun suo
+        ta tai tan tang tao te teng ti tian tiao tie ting tong tou tu tuan tui tun tuo
+        wa wai wan wang wei wen weng wo wu xi xia xian xiang xiao xie xin xing xiong xiu
+        xu xuan xue xun ya yan yang yao ye yi yin ying yo yong you yu yuan yue yun za
+        zai zan zang zao ze zei zen zeng zha zhai zhan zhang zhao zhe zhei zhen zheng
+        zhi zhong zhou zhu zhua zhuai zhuan zhuang zhui zhun zhuo zi zong zou zu zuan
+        zui zun zuo
+    '''.split()
+
+    numbered_syllable = re.compile(r'[A-Za-z:]+[1-5]')
+    marked_syllable = re.compile(r'[A-Za-z:{}]+'.format(''.join(toned_vowels_decomposed)))
+
+    __prettified = None
+    __uglified = None
+
+    def __init__(self):
+        if Converter.__prettified is None:
+            Converter.__prettified, Converter.__uglified = self.__build_tables()
+
+    def __build_tables(self):
+        prettified, uglified = {}, {}
+        for syllable in self.syllables:
+            for form in (syllable, syllable.capitalize()):
+                for tone in range(1, 6):
+                    if tone in self.tones and not self.__contains_vowel(form):
+                        continue
+                    numbered = form + str(tone)
+                    pretty = self.__prettify_syllable(numbered)
+                    prettified[numbered] = pretty
+                    uglified.setdefault(pretty, self.__uglify_syllable(pretty))
+        return prettified, uglified
 
     def prettify(self, string):
         if not isinstance(string, str):
             raise errors.InvalidArgumentTypeError('Argument must be a string: {}'.format(string))
 
+        pretty = self.__prettified.get(string)
+        if pretty is not None:
+            return pretty
+        return self.__prettify_syllable(string)
+
+    def uglify(self, string):
+        if not isinstance(string, str):
+            raise errors.InvalidArgumentTypeError('Argument must be a string: {}'.format(string))
+
+        ugly = self.__uglified.get(string)
+        if ugly is not None:
+            return ugly
+        return self.__uglify_syllable(string)
+
+    def prettify_many(self, syllables):
+        """Converts many syllables from tone numbers to tone marks at once.
+
+        Args:
+            syllables: A list of syllables like ['zhong1', 'guo2'], or a string in
+                which every syllable ending with a tone number is converted, like
+                'zhong1 guo2'.
+
+        Returns:
+            A list or a string, following the type of the argument.
+        """
+        if isinstance(syllables, str):
+            return self.numbered_syllable.sub(lambda m: self.prettify(m.group()), syllables)
+        table = self.__prettified
+        return [table[s] if s in table else self.prettify(s) for s in syllables]
+
+    def uglify_many(self, syllables):
+        """Converts many syllables from tone marks to tone numbers at once.
+
+        Args:
+            syllables: A list of syllables like ['zhōng', 'guó'], or a string of
+                syllables separated by spaces or punctuation, like 'zhōng guó'.
+
+        Returns:
+            A list or a string, following the type of the argument.
+        """
+        if isinstance(syllables, str):
+            return self.marked_syllable.sub(lambda m: self.uglify(m.group()), syllables)
+        table = self.__uglified
+        return [table[s] if s in table else self.uglify(s) for s in syllables]
+
+    def __prettify_syllable(self, string):
         if len(string) == 0 or not string[-1].isdigit():
             return string
 
@@ -40,17 +146,16 @@ class Converter:
             characters = characters.replace('ou', self.toned_vowels['o'][tone] + 'u')
         else:
             i = len(characters) - 1
-            while characters[i] not in self.toned_vowels:
+            while i >= 0 and characters[i] not in self.toned_vowels:
                 i -= 1
+            if i < 0:
+                return string
             vowel = characters[i]
             characters = characters[:i] + self.toned_vowels[vowel][tone] + characters[i+1:]
-        
-        return characters
 
-    def uglify(self, string):
-        if not isinstance(string, str):
-            raise errors.InvalidArgumentTypeError('Argument must be a string: {}'.format(string))
+        return characters
 
+    def __uglify_syllable(self, string):
         if len(string) == 0:
             return string
 
@@ -61,22 +166,9 @@ class Converter:
         return any(c.lower() in self.toned_vowels for c in string)
 
     def __replace_toned_vowel(self, string):
-        toned_vowels_decomposed = {
-            'ā': ('a', 1), 'á': ('a', 2), 'ǎ': ('a', 3), 'à': ('a', 4),
-            'ē': ('e', 1), 'é': ('e', 2), 'ě': ('e', 3), 'è': ('e', 4),
-            'ī': ('i', 1), 'í': ('i', 2), 'ǐ': ('i', 3), 'ì': ('i', 4),
-            'ō': ('o', 1), 'ó': ('o', 2), 'ǒ': ('o', 3), 'ò': ('o', 4),
-            'ū': ('u', 1), 'ú': ('u', 2), 'ǔ': ('u', 3), 'ù': ('u', 4),
-            'Ā': ('A', 1), 'Á': ('A', 2), 'Ǎ': ('A', 3), 'À': ('A', 4),
-            'Ē': ('E', 1), 'É': ('E', 2), 'Ě': ('E', 3), 'È': ('E', 4),
-            'Ī': ('I', 1), 'Í': ('I', 2), 'Ǐ': ('I', 3), 'Ì': ('I', 4),
-            'Ō': ('O', 1), 'Ó': ('O', 2), 'Ǒ': ('O', 3), 'Ò': ('O', 4),
-            'Ū': ('U', 1), 'Ú': ('U', 2), 'Ǔ': ('U', 3), 'Ù': ('U', 4),
-        }
-
         for c in string:
-            if c in toned_vowels_decomposed:
-                replacer, tone = toned_vowels_decomposed[c]
+            if c in self.toned_vowels_decomposed:
+                replacer, tone = self.toned_vowels_decomposed[c]
                 return string.replace(c, replacer), str(tone)
-        
+
         return string, '5'
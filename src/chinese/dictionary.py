@@ -1,13 +1,30 @@
 #!/usr/bin/env python
 # coding: utf-8
 
-from collections import namedtuple
+from array import array
+from bisect import bisect_left
+from collections import ChainMap, namedtuple
+from collections.abc import Mapping
+import copy
+from functools import lru_cache
+import glob
+import hashlib
 import logging
+from multiprocessing import Pool
 import os
 import pickle
 import re
+import struct
+from sys import intern
+import threading
+import time
 
-from chinese.converter import Converter
+from chinese.pinyin import table as pinyin_table
+from chinese.script import ScriptConverter
+from chinese.search import DefinitionIndex, PinyinIndex
+from chinese.store import Store, StoreWriter, Table, cache_directory, pack_table
+from chinese.store import VERSION as STORE_VERSION
+from chinese.tokenizer import WordTable
 import chinese.errors as errors
 
 
@@ -17,39 +34,118 @@ Datum = namedtuple('Datum', ['traditional', 'simplified', 'pinyin', 'definitions
 Datum.__new__.__defaults__ = (None, None, None, None)
 
 class LookupResult:
+    """A dictionary entry.
+
+    The pinyin is held as an array of syllable codes (see chinese.pinyin), and its
+    renderings come from tables shared by all entries.
+    """
+
+    __slots__ = ('match', 'definitions', '__codes', '__rendered')
     
-    def __init__(self, match, pinyin, definitions):
+    def __init__(self, match, pinyin, definitions, *, rendered=None):
         self.match = match
         self.pinyin = pinyin
         self.definitions = definitions
+        self.__rendered = rendered
+
+    @classmethod
+    @lru_cache(maxsize=4096)
+    def miss(cls, match):
+        """Returns the shared result for a string which is not in the dictionary."""
+        return cls(match, None, None)
+
+    @property
+    def pinyin(self):
+        """The list of syllables with tone numbers, like ['Zhong1', 'guo2']."""
+        return None if self.__codes is None else pinyin_table.numbers(self.__codes)
+
+    @pinyin.setter
+    def pinyin(self, pinyin):
+        # An array of codes is taken as is, so entries can share it.
+        self.__codes = pinyin if isinstance(pinyin, array) else pinyin_table.pack(pinyin)
+        self.__rendered = None
+
+    @property
+    def pinyin_codes(self):
+        return self.__codes
+
+    @property
+    def pinyin_marks(self):
+        """The pinyin with tone marks, like 'Zhōngguó'."""
+        if self.__rendered is not None:
+            return self.__rendered[0]
+        return None if self.__codes is None else pinyin_table.marks(self.__codes)
+
+    @property
+    def pinyin_numbers(self):
+        """The pinyin with tone numbers, like 'Zhong1 guo2'."""
+        if self.__rendered is not None:
+            return self.__rendered[1]
+        return None if self.__codes is None else ' '.join(pinyin_table.numbers(self.__codes))
+
+    @property
+    def pinyin_toneless(self):
+        """The pinyin without tones, like 'Zhongguo'."""
+        if self.__rendered is not None:
+            return self.__rendered[2]
+        return None if self.__codes is None else pinyin_table.toneless(self.__codes)
+
+    @property
+    def pinyin_zhuyin(self):
+        """The pinyin in zhuyin, like 'ㄓㄨㄥ ㄍㄨㄛˊ'."""
+        return None if self.__codes is None else pinyin_table.zhuyin(self.__codes)
+
+    def __getstate__(self):
+        # Codes are only meaningful in the process which interned them.
+        return {'match': self.match, 'pinyin': self.pinyin, 'definitions': self.definitions}
+
+    def __setstate__(self, state):
+        self.match = state['match']
+        self.pinyin = state['pinyin']
+        self.definitions = state['definitions']
+        self.__rendered = None
     
-    def __str__(self):
-        from pprint import pformat
-        
-        data = {
+    def to_dict(self):
+        return {
             'kind': self.__class__.__name__,
             'match': self.match,
             'pinyin': self.pinyin,
             'definitions': self.definitions
         }
 
-        return pformat(data)
+    @staticmethod
+    def from_dict(data):
+        """Returns the lookup result described by a dict returned by to_dict()."""
+        kind = {'Simplified': Simplified, 'Traditional': Traditional}.get(data['kind'])
+        if kind is None:
+            raise errors.InvalidArgumentTypeError('Unknown kind: {}'.format(data['kind']))
+        if data['pinyin'] is None and data['definitions'] is None:
+            return kind.miss(data['match'])
+        return kind(data['match'], data['pinyin'], data['definitions'])
+    
+    def __str__(self):
+        from pprint import pformat
+        return pformat(self.to_dict())
 
     def __eq__(self, other):
         return self.__class__ == other.__class__ and\
             self.match == other.match and\
-            self.pinyin == other.pinyin and\
+            self.__codes == other.__codes and\
             self.definitions == other.definitions
 
-class Simplified(LookupResult): pass
-class Traditional(LookupResult): pass
+class Simplified(LookupResult):
+    __slots__ = ()
+
+class Traditional(LookupResult):
+    __slots__ = ()
 
 class Parser:
+
+    pattern = re.compile(r'^(?P<traditional>[^ ]+) (?P<simplified>[^ ]+) \[(?P<pinyin>[\w ]+)\] /(?P<english>.+)/$')
     
     @classmethod
     def parse_line(cls, line):
-        pattern = r'^(?P<traditional>[^ ]+) (?P<simplified>[^ ]+) \[(?P<pinyin>[\w ]+)\] /(?P<english>.+)/$'
-        match = re.match(pattern, line)
+        match = cls.pattern.match(line)
         if match:
             return Datum(
                 match.group('traditional'),
@@ -59,6 +155,21 @@ class Parser:
             )
         return Datum()
 
+    @classmethod
+    def parse_lines(cls, lines):
+        """Returns a list of (traditional, simplified, pinyin, definitions) tuples.
+
+        Lines which are not CC-CEDICT entries, e.g. comments, are skipped.
+        """
+        match = cls.pattern.match
+        data = []
+        for line in lines:
+            m = match(line)
+            if m:
+                traditional, simplified, pinyin, english = m.groups()
+                data.append((traditional, simplified, pinyin.split(' '), english.split('/')))
+        return data
+
     @classmethod
     def __split_pinyin(cls, pinyin_string):
         return pinyin_string.split(' ')
@@ -67,94 +178,900 @@ class Parser:
     def __split_english(cls, english_string):
         return english_string.split('/')
 
+class Codec:
+    """Encodes the entries of a headword into the bytes stored in a compiled dictionary.
+
+    The rendered forms of the pinyin are stored along with it, so they are not
+    computed again at lookup time.
+    """
+
+    ENTRY_SEPARATOR = '\x1e'
+    FIELD_SEPARATOR = '\x1f'
+
+    @classmethod
+    def encode(cls, entries):
+        return cls.ENTRY_SEPARATOR.join(
+            cls.FIELD_SEPARATOR.join([
+                entry.match,
+                entry.pinyin_numbers,
+                '/'.join(entry.definitions),
+                entry.pinyin_marks,
+                entry.pinyin_toneless,
+            ]) for entry in entries
+        ).encode('utf-8')
+
+    @classmethod
+    def decode(cls, data, kind):
+        entries = []
+        for entry in data.decode('utf-8').split(cls.ENTRY_SEPARATOR):
+            match, pinyin, definitions, marks, toneless = entry.split(cls.FIELD_SEPARATOR)
+            entries.append(kind(match, pinyin.split(' '), definitions.split('/'),
+                                rendered=(marks, pinyin, toneless)))
+        return entries
+
+class CompiledIndex(Mapping):
+    """A read-only mapping from headwords to lookup results backed by a compiled table.
+
+    Entries are decoded only when they are looked up.
+    """
+
+    def __init__(self, table, kind):
+        self.__table = table
+        self.__kind = kind
+
+    def __getitem__(self, key):
+        i = self.__table.find(key.encode('utf-8'))
+        if i < 0:
+            raise KeyError(key)
+        return Codec.decode(self.__table.value(i), self.__kind)
+
+    def __contains__(self, key):
+        return isinstance(key, str) and self.__table.find(key.encode('utf-8')) >= 0
+
+    def __iter__(self):
+        for i in range(len(self.__table)):
+            yield self.__table.key(i).decode('utf-8')
+
+    def __len__(self):
+        return len(self.__table)
+
+    def keys_with_prefix(self, prefix, limit=None):
+        """Returns the headwords starting with prefix in code point order, at most limit of them."""
+        key = prefix.encode('utf-8')
+        table = self.__table
+        keys = []
+        i = table.bisect_left(key)
+        while i < len(table) and (limit is None or len(keys) < limit):
+            candidate = table.key(i)
+            if not candidate.startswith(key):
+                break
+            keys.append(candidate.decode('utf-8'))
+            i += 1
+        return keys
+
+    def longest_prefix(self, string):
+        """Returns the longest headword which is a prefix of string, or None."""
+        table = self.__table
+        longest = None
+        for end in range(1, len(string) + 1):
+            key = string[:end].encode('utf-8')
+            i = table.bisect_left(key)
+            if i == len(table) or not table.key(i).startswith(key):
+                break
+            if table.key(i) == key:
+                longest = string[:end]
+        return longest
+
+class SortedKeys:
+    """Prefix queries over the headwords of an in-memory dictionary, sorted in code point order."""
+
+    def __init__(self, keys):
+        self.__keys = sorted(keys)
+
+    def keys_with_prefix(self, prefix, limit=None):
+        """Returns the headwords starting with prefix in code point order, at most limit of them."""
+        keys = []
+        for i in range(bisect_left(self.__keys, prefix), len(self.__keys)):
+            if (limit is not None and len(keys) >= limit) or not self.__keys[i].startswith(prefix):
+                break
+            keys.append(self.__keys[i])
+        return keys
+
+    def longest_prefix(self, string):
+        """Returns the longest headword which is a prefix of string, or None."""
+        longest = None
+        for end in range(1, len(string) + 1):
+            prefix = string[:end]
+            i = bisect_left(self.__keys, prefix)
+            if i == len(self.__keys) or not self.__keys[i].startswith(prefix):
+                break
+            if self.__keys[i] == prefix:
+                longest = prefix
+        return longest
+
+class ReadingTable:
+    """The default reading of every CJK Unified Ideograph, in an array indexed by code point.
+
+    It covers the CJK Unified Ideographs block and Extensions A and B. The array
+    holds indexes into the distinct readings, with tone marks in lowercase, and 0
+    for characters which have none. An edited copy, returned by edit(), looks up
+    the edited characters apart from the array.
+    """
+
+    # Extension A, the Yijing hexagrams and the main block are contiguous, and followed
+    # by Extension B in the array. The hexagrams have no reading.
+    bmp = (0x3400, 0x9FFF)
+    hexagrams = (0x4DC0, 0x4DFF)
+    extension_b = (0x20000, 0x2A6DF)
+
+    __header = struct.Struct('<II')
+
+    def __init__(self, buffer):
+        """
+        Args:
+            buffer: A buffer returned by build().
+        """
+        buffer = memoryview(buffer)
+        length, itemsize = self.__header.unpack_from(buffer, 0)
+        start = self.__header.size
+        self.__readings = [''] + bytes(buffer[start:start + length]).decode('utf-8').split('\n')
+        start += (length + 7) // 8 * 8
+        self.__indexes = buffer[start:].cast('H' if itemsize == 2 else 'I')
+        self.__edited = {}
+        self.__pattern = None
+
+    @classmethod
+    def covers(cls, code_point):
+        if cls.bmp[0] <= code_point <= cls.bmp[1]:
+            return not cls.hexagrams[0] <= code_point <= cls.hexagrams[1]
+        return cls.extension_b[0] <= code_point <= cls.extension_b[1]
+
+    @classmethod
+    def build(cls, dictionary):
+        """Returns the buffer for a mapping of headwords to entries, using the first entry of each character."""
+        (low, high), (low_b, high_b) = cls.bmp, cls.extension_b
+        indexes = [0] * (high - low + 1 + high_b - low_b + 1)
+        readings = {}
+        for key in dictionary:
+            if len(key) != 1 or not cls.covers(ord(key)):
+                continue
+            reading = cls.__reading(dictionary[key])
+            if not reading:
+                continue
+            code_point = ord(key)
+            i = code_point - low if code_point <= high else code_point - low_b + high - low + 1
+            indexes[i] = readings.setdefault(reading, len(readings) + 1)
+
+        itemsize = 2 if len(readings) < 1 << 16 else 4
+        blob = '\n'.join(sorted(readings, key=readings.get)).encode('utf-8')
+        return b''.join([
+            cls.__header.pack(len(blob), itemsize),
+            blob,
+            b'\x00' * (-len(blob) % 8),
+            array('H' if itemsize == 2 else 'I', indexes).tobytes(),
+        ])
+
+    @staticmethod
+    def __reading(entries):
+        if not entries or entries[0].pinyin_codes is None:
+            return ''
+        return entries[0].pinyin_marks.lower()
+
+    def edit(self, changes):
+        """Returns a copy of the table in which edited headwords have new entries.
+
+        Args:
+            changes (dict): The edited headwords and all their entries, an empty
+                list for a removed headword.
+        """
+        edited = copy.copy(self)
+        readings = {key: self.__reading(entries) for key, entries in changes.items()
+                    if len(key) == 1 and self.covers(ord(key))}
+        edited.__edited = {**self.__edited, **readings}
+        if edited.__edited:
+            edited.__pattern = re.compile('([{}])'.format(re.escape(''.join(sorted(edited.__edited)))))
+        return edited
+
+    def convert(self, string):
+        """Returns the string with each character replaced by its reading, if it has one."""
+        if self.__pattern is None:
+            return self.__convert(string)
+        edited = self.__edited
+        # Edited characters are at the odd positions of the split string.
+        return ''.join(edited[part] or part if i % 2 else self.__convert(part)
+                       for i, part in enumerate(self.__pattern.split(string)))
+
+    def __convert(self, string):
+        indexes, readings = self.__indexes, self.__readings
+        (low, high), (low_b, high_b) = self.bmp, self.extension_b
+        shift = high - low + 1 - low_b
+        return ''.join([
+            readings[indexes[code_point - low]] or character if low <= code_point <= high else
+            readings[indexes[code_point + shift]] or character if low_b <= code_point <= high_b else
+            character
+            for character, code_point in zip(string, map(ord, string))
+        ])
+
+class EditedIndex(Mapping):
+    """A read-only mapping of headwords to lookup results with edits over a base mapping.
+
+    The edits map headwords to their new entries, an empty list removing the
+    headword. The base is referenced, not copied, so editing a compiled dictionary
+    costs as much as the edited headwords.
+    """
+
+    def __init__(self, base, changes, prefixes=None):
+        """
+        Args:
+            base: A dict or a CompiledIndex.
+            changes (dict): The edited headwords and their entries.
+            prefixes: The prefix index of the base. Built on first use if None.
+        """
+        self.base = base
+        self.changes = changes
+        self.__prefixes = prefixes
+
+    @property
+    def prefixes(self):
+        if self.__prefixes is None:
+            if isinstance(self.base, (CompiledIndex, SortedKeys)):
+                self.__prefixes = self.base
+            else:
+                self.__prefixes = SortedKeys(key for key in self.base if key != 'name')
+        return self.__prefixes
+
+    def __getitem__(self, key):
+        entries = self.changes.get(key)
+        if entries is None:
+            return self.base[key]
+        if not entries:
+            raise KeyError(key)
+        return entries
+
+    def __contains__(self, key):
+        entries = self.changes.get(key)
+        if entries is None:
+            return key in self.base
+        return bool(entries)
+
+    def __iter__(self):
+        for key in self.base:
+            if key not in self.changes:
+                yield key
+        for key, entries in self.changes.items():
+            if entries:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def keys_with_prefix(self, prefix, limit=None):
+        """Returns the headwords starting with prefix in code point order, at most limit of them."""
+        extra = None if limit is None else limit + len(self.changes)
+        keys = {key for key in self.prefixes.keys_with_prefix(prefix, extra) if key not in self.changes}
+        keys.update(key for key, entries in self.changes.items() if entries and key.startswith(prefix))
+        return sorted(keys)[:limit]
+
+    @staticmethod
+    def changed_keys(old, new):
+        """Returns the headwords whose entries may differ between two mappings.
+
+        Returns None unless both mappings are edits of the same base, or one of
+        them is the base of the other.
+        """
+        def split(mapping):
+            if isinstance(mapping, EditedIndex):
+                return mapping.base, mapping.changes
+            return mapping, {}
+
+        (old_base, old_changes), (new_base, new_changes) = split(old), split(new)
+        if old_base is not new_base:
+            return None
+        return old_changes.keys() | new_changes.keys()
+
+    def longest_prefix(self, string):
+        """Returns the longest headword which is a prefix of string, or None."""
+        longest = self.prefixes.longest_prefix(string)
+        if longest is not None and longest not in self:
+            longest = next((string[:end] for end in range(len(longest) - 1, 0, -1)
+                            if string[:end] in self), None)
+        for key, entries in self.changes.items():
+            if entries and string.startswith(key) and (longest is None or len(key) > len(longest)):
+                longest = key
+        return longest
+
 class Dictionary:
+
+    # The number of lines parsed at a time by a worker process.
+    chunksize = 20000
+
+    journal_suffix = '.journal'
+    removal = re.compile(r'^(?P<traditional>[^ ]+) (?P<simplified>[^ ]+)(?: \[(?P<pinyin>[\w ]+)\])?(?: /(?P<english>.+)/)?$')
     
     def __init__(self):
-        self.__converter = Converter()
         self.traditional = None
         self.simplified = None
+        self.path = None
+        self.__source = None
+        self.__store = None
+        self.__extendable = False
+        self.__sorted_keys = {}
+        self.__indexes = {}
+        self.__journal = None
+        self.__edits = None
+        self.__unjournaled = []
+        self.__edit_lock = threading.RLock()
+
+    def __parse_data(self, data, workers=None):
+        lines = data.readlines() if hasattr(data, 'readlines') else list(data)
+        chunks = [lines[i:i + self.chunksize] for i in range(0, len(lines), self.chunksize)]
+        workers = min(workers or os.cpu_count() or 1, len(chunks))
+        if workers > 1:
+            with Pool(workers) as pool:
+                parsed_chunks = pool.map(Parser.parse_lines, chunks)
+        else:
+            parsed_chunks = map(Parser.parse_lines, chunks)
 
-    def __parse_data(self, data):
         traditional = {'name': 'traditional'}
         simplified = {'name': 'simplified'}
-        
-        for line in data:
-            datum = Parser.parse_line(line)
-            self.__add_datum(traditional, simplified, datum)
+        for parsed in parsed_chunks:
+            for datum in parsed:
+                self.__add_datum(traditional, simplified, datum)
         
         return traditional, simplified
     
     def __add_datum(self, traditional, simplified, datum):
-        if datum != Datum():
-            traditional_datum = Traditional(
-                datum.simplified,
-                datum.pinyin,
-                datum.definitions,
-            )
-            simplified_datum = Simplified(
-                datum.traditional,
-                datum.pinyin,
-                datum.definitions,
-            )
-            if datum.traditional in traditional:
-                traditional[datum.traditional].append(traditional_datum)
-            else:
-                traditional[datum.traditional] = [traditional_datum]
-            if datum.simplified in simplified:
-                simplified[datum.simplified].append(simplified_datum)
-            else:
-                simplified[datum.simplified] = [simplified_datum]
+        traditional_key, simplified_key = datum[:2]
+        traditional_datum, simplified_datum = self.__entries(datum)
+        if traditional_key in traditional:
+            traditional[traditional_key].append(traditional_datum)
+        else:
+            traditional[traditional_key] = [traditional_datum]
+        if simplified_key in simplified:
+            simplified[simplified_key].append(simplified_datum)
+        else:
+            simplified[simplified_key] = [simplified_datum]
     
-    def load(self, path=None):
+    @staticmethod
+    def __entries(datum):
+        """Returns the Traditional and Simplified entries of a datum, sharing its pinyin and definitions."""
+        traditional_key, simplified_key, pinyin, definitions = datum
+        codes = pinyin_table.pack(pinyin)
+        definitions = [intern(definition) for definition in definitions]
+        return Traditional(simplified_key, codes, definitions), Simplified(traditional_key, codes, definitions)
+
+    def load(self, path=None, *, cache=True, workers=None):
+        """Loads a dictionary.
+
+        A CC-CEDICT formatted file is parsed in chunks over a pool of processes
+        and compiled into a cache file next to it (or in chinese's cache directory
+        if that is not writable). The cache is keyed by the file's content hash,
+        so an unchanged file is only parsed once. It starts with the lookup tables
+        only; the other indexes are appended to it the first time they are used.
+
+        Args:
+            path (str): A path to a CC-CEDICT formatted file or a compiled dictionary.
+                If None, the default dictionary is loaded, preferring its compiled form.
+            cache (bool): If set to False, the compiled cache is neither read nor written.
+            workers (int): The number of processes used for parsing. Defaults to the
+                number of CPUs. Small files are parsed in this process.
+        """
+        self.path = path
+        self.__journal = self.__edits = None
+        self.__unjournaled = []
         if path is None:
             logger.info('Loading the default dictionary.')
             directory = os.path.abspath(os.path.dirname(__file__))
+            compiled = os.path.join(directory, 'data', 'cedict.bin')
+            if os.path.exists(compiled):
+                try:
+                    self.__open(compiled)
+                    return
+                except errors.InvalidDictionaryError:
+                    logger.warning('Ignoring the outdated compiled dictionary {}.'.format(compiled))
             cedict = os.path.join(directory, 'data', 'cedict.pickle')
             with open(cedict, 'rb') as f:
                 cedict_data = pickle.load(f)
                 self.traditional, self.simplified = cedict_data['traditional'], cedict_data['simplified']
+            self.__source = self.__describe(cedict)
+        elif Store.is_compiled(path):
+            self.__open(path, journal=True)
         else:
-            with open(path) as f:
-                self.traditional, self.simplified = self.__parse_data(f)
+            self.__ingest(path, cache, workers)
+
+    def __ingest(self, path, cache, workers):
+        if cache:
+            digest = self.__digest(path)
+            for cached in self.__cache_paths(path, digest):
+                if os.path.exists(cached):
+                    logger.info('Loading the compiled cache of {}.'.format(path))
+                    self.__open(cached)
+                    self.__extendable = True
+                    return
+
+        with open(path, encoding='utf-8') as f:
+            self.traditional, self.simplified = self.__parse_data(f, workers)
+        self.__source = self.__describe(path)
+
+        if cache:
+            for cached in self.__cache_paths(path, digest):
+                try:
+                    self.__remove_stale_caches(cached)
+                    self.__lookup_tables().write(cached)
+                except OSError:
+                    continue
+                self.__open(cached)
+                self.__extendable = True
+                return
+            logger.warning('Could not write the compiled cache of {}.'.format(path))
+
+    @staticmethod
+    def __digest(path):
+        digest = hashlib.sha256(b'store-v%d:' % STORE_VERSION)
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()[:32]
+
+    @staticmethod
+    def __cache_paths(path, digest):
+        """Returns the candidate cache paths, next to the source first."""
+        directory, name = os.path.split(os.path.abspath(path))
+        filename = '.{}.{}.bin'.format(name, digest)
+        return [os.path.join(directory, filename), os.path.join(cache_directory('dictionaries'), filename)]
+
+    @staticmethod
+    def __remove_stale_caches(cached):
+        prefix = cached.rsplit('.', 2)[0]
+        # Matches the digest exactly, so loading mydict keeps the caches of e.g. mydict.u8.
+        for stale in glob.glob(glob.escape(prefix) + '.' + '[0-9a-f]' * 32 + '.bin'):
+            if stale != cached:
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+
+    @staticmethod
+    def __describe(path):
+        stat = os.stat(path)
+        return '{}:{}:{}'.format(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+    @property
+    def identity(self):
+        """A string which changes whenever the loaded dictionary may have changed.
+
+        It is derived from the path, modification time and size of the loaded file
+        and stays the same across processes, so it can be part of persistent cache keys.
+        """
+        self.__init_dict_if_necessary()
+        source = self.__source or repr(id(self.simplified))
+        if self.__edits is not None:
+            source += '+' + self.__edits.hexdigest()
+        return hashlib.sha256(source.encode('utf-8')).hexdigest()[:32]
+
+    def __open(self, path, journal=False):
+        """Opens a compiled dictionary, replaying its journal if journal is set."""
+        store = Store(path)
+        self.__source = self.__describe(path)
+        self.traditional, self.simplified = (
+            CompiledIndex(Table(store.section('traditional')), Traditional),
+            CompiledIndex(Table(store.section('simplified')), Simplified),
+        )
+        self.__store, self.__extendable = store, False
+        self.__indexes = {}
+        self.__journal = self.__edits = None
+        self.__unjournaled = []
+        if journal:
+            self.__journal = os.path.abspath(path) + self.journal_suffix
+            self.__replay_journal()
     
+    def overlay(self, *dictionaries):
+        """Returns a Dictionary looking up the given dictionaries before this one.
+
+        A headword takes all its entries from the first of the dictionaries which
+        has it, followed by this one, so an overlay replaces the entries of the
+        dictionaries below it. The dictionaries are referenced, not copied.
+        """
+        layers = dictionaries + (self,)
+        for layer in layers:
+            layer.__init_dict_if_necessary()
+        layered = Dictionary()
+        layered.traditional = ChainMap(*(layer.traditional for layer in layers))
+        layered.simplified = ChainMap(*(layer.simplified for layer in layers))
+        layered.__source = 'overlay:' + ','.join(layer.identity for layer in layers)
+        return layered
+
+    def add_entry(self, traditional, simplified, pinyin, definitions):
+        """Adds an entry after the existing entries of its headwords.
+
+        Only the edited headwords are copied, so an edit takes about as long as a
+        lookup. If the dictionary was loaded from a compiled file, the edit is also
+        appended to a journal next to it, which load() replays until compile()
+        writes the file again. Other edits are kept in memory; see unjournaled_edits().
+
+        The indexes built from all the entries, used by search_definitions(),
+        lookup_with_pinyin(), the lookup_character_pinyin methods, convert() and the
+        cedict tokenizer, are kept and the edited headwords are applied to them in
+        the same way. Edited entries are weighted with the statistics of the
+        indexes, e.g. the document frequencies of search_definitions(), and
+        characters keep the conversions convert() was built with, so compile() the
+        dictionary after many edits to rebuild the indexes.
+
+        Args:
+            traditional (str): The Traditional Chinese headword.
+            simplified (str): The Simplified Chinese headword.
+            pinyin (list): Syllables with tone numbers, like ['Zhong1', 'guo2'].
+            definitions (list): English definitions.
+        """
+        self.__edit([], [Datum(traditional, simplified, list(pinyin), list(definitions))])
+
+    def remove_entry(self, traditional, simplified, pinyin=None, definitions=None):
+        """Removes the entries of the headwords, keeping those whose pinyin or definitions
+        differ from the given ones. See add_entry.
+
+        Returns:
+            The number of entries removed.
+        """
+        return self.__edit([Datum(traditional, simplified, pinyin, definitions)], [])
+
+    def apply_cedict_diff(self, old, new):
+        """Applies the changes between two releases of a CC-CEDICT formatted file.
+
+        Only the lines which differ are parsed. An entry whose definitions changed
+        keeps its position among the entries of its headwords. See add_entry.
+
+        Args:
+            old (str): A path to the release the dictionary was built from.
+            new (str): A path to the new release.
+
+        Returns:
+            A tuple of the numbers of entries added and removed.
+        """
+        with open(old, encoding='utf-8') as f:
+            old_lines = f.read().splitlines()
+        with open(new, encoding='utf-8') as f:
+            new_lines = f.read().splitlines()
+        old_set, new_set = set(old_lines), set(new_lines)
+        removed = [line for line in old_lines if line not in new_set]
+        added = [line for line in new_lines if line not in old_set]
+        removals = [Datum(*datum) for datum in Parser.parse_lines(removed)]
+        additions = [Datum(*datum) for datum in Parser.parse_lines(added)]
+        return len(additions), self.__edit(removals, additions)
+
+    def __edit(self, removals, additions, journal=True):
+        """Applies the removals, then the additions, and publishes the edited indexes.
+
+        Returns:
+            The number of entries removed.
+        """
+        with self.__edit_lock:
+            self.__init_dict_if_necessary()
+            edited = [self.__editable(self.traditional), self.__editable(self.simplified)]
+            # An entry added in place of a removed one with the same reading takes its position.
+            positions = {}
+            removed = 0
+            for traditional_key, simplified_key, pinyin, definitions in removals:
+                sides = zip(edited, (traditional_key, simplified_key), (simplified_key, traditional_key))
+                for side, ((base, changes), key, match) in enumerate(sides):
+                    entries = changes[key] if key in changes else list(base.get(key, ()))
+                    kept = []
+                    for entry in entries:
+                        if entry.match == match and pinyin in (None, entry.pinyin) \
+                                and definitions in (None, entry.definitions):
+                            positions.setdefault((side, key, match, tuple(entry.pinyin)), len(kept))
+                            removed += side
+                        else:
+                            kept.append(entry)
+                    changes[key] = kept
+            for datum in additions:
+                sides = zip(edited, datum[:2], self.__entries(datum))
+                for side, ((base, changes), key, entry) in enumerate(sides):
+                    entries = changes[key] if key in changes else list(base.get(key, ()))
+                    position = positions.pop((side, key, entry.match, tuple(datum.pinyin)), len(entries))
+                    entries.insert(position, entry)
+                    changes[key] = entries
+
+            lines = ['-' + self.__format(datum) for datum in removals]
+            lines += ['+' + self.__format(datum) for datum in additions]
+            if journal and (self.__journal is None or not self.__append_journal(lines)):
+                self.__unjournaled.append(lines)
+            if self.__edits is None:
+                self.__edits = hashlib.sha256()
+            for line in lines:
+                self.__edits.update(line.encode('utf-8') + b'\n')
+            traditional, simplified = (
+                EditedIndex(base, changes, prefixes)
+                for (base, changes), prefixes in zip(edited, self.__prefixes_of_edited())
+            )
+            self.traditional, self.simplified = traditional, simplified
+            return removed
+
+    def __editable(self, dictionary):
+        """Returns the base and a copy of the changes of a mapping about to be edited."""
+        if isinstance(dictionary, EditedIndex):
+            return dictionary.base, dict(dictionary.changes)
+        return dictionary, {}
+
+    def __prefixes_of_edited(self):
+        for dictionary in (self.traditional, self.simplified):
+            yield dictionary.prefixes if isinstance(dictionary, EditedIndex) else None
+
+    @staticmethod
+    def __format(datum):
+        """Returns a datum as a CC-CEDICT line, leaving out the pinyin and definitions if None."""
+        line = '{} {}'.format(datum.traditional, datum.simplified)
+        if datum.pinyin is not None:
+            line += ' [{}]'.format(' '.join(datum.pinyin))
+        if datum.definitions is not None:
+            line += ' /{}/'.format('/'.join(datum.definitions))
+        return line
+
+    def __append_journal(self, lines):
+        """Appends a batch of edits, terminated by an empty line, to the journal.
+
+        Returns:
+            True if the batch was written.
+        """
+        header = '# {}\n'.format(self.__source)
+        try:
+            with open(self.__journal, 'a', encoding='utf-8') as f:
+                if f.tell() == 0:
+                    f.write(header)
+                f.write(''.join(line + '\n' for line in lines) + '\n')
+        except OSError:
+            logger.warning('Could not write the journal {}.'.format(self.__journal))
+            return False
+        return True
+
+    def __replay_journal(self):
+        try:
+            with open(self.__journal, encoding='utf-8') as f:
+                lines = f.read().split('\n')
+        except OSError:
+            return
+        if lines[0] != '# {}'.format(self.__source):
+            logger.warning('Ignoring the journal of another version of the dictionary: {}'.format(self.__journal))
+            return
+
+        logger.info('Replaying the journal {}.'.format(self.__journal))
+        batch = []
+        # The last element follows the last newline, so an unterminated batch is dropped.
+        for line in lines[1:-1]:
+            if line:
+                batch.append(line)
+                continue
+            self.__replay(batch)
+            batch = []
+
+    def __replay(self, batch):
+        """Applies a batch of journal lines without journaling it again."""
+        removals = [self.__parse_removal(line[1:]) for line in batch if line[0] == '-']
+        additions = [Parser.parse_line(line[1:]) for line in batch if line[0] == '+']
+        self.__edit(removals, additions, journal=False)
+
+    def unjournaled_edits(self):
+        """Returns the edits which load() does not replay, to be passed to replay_edits().
+
+        They are the edits of a dictionary not loaded from a compiled file, which
+        has no journal, or those which could not be written to the journal.
+
+        Returns:
+            A list of batches of edits, each a list of CC-CEDICT lines prefixed
+            with '-' for removals and '+' for additions.
+        """
+        with self.__edit_lock:
+            return [list(batch) for batch in self.__unjournaled]
+
+    def replay_edits(self, batches):
+        """Applies the edits returned by unjournaled_edits() of a dictionary loaded
+        from the same file. They are not journaled again."""
+        for batch in batches:
+            self.__replay(batch)
+
+    @classmethod
+    def __parse_removal(cls, line):
+        match = cls.removal.match(line)
+        if match is None:
+            raise errors.InvalidDictionaryError('Invalid journal entry: {}'.format(line))
+        pinyin, english = match.group('pinyin'), match.group('english')
+        return Datum(match.group('traditional'), match.group('simplified'),
+                     None if pinyin is None else pinyin.split(' '),
+                     None if english is None else english.split('/'))
+
     def __init_dict_if_necessary(self):
         if self.traditional is None or self.simplified is None:
             self.load()
 
+    def headwords(self, *, traditional=False):
+        """Returns an iterator over the headwords of the dictionary."""
+        self.__init_dict_if_necessary()
+        dictionary = self.traditional if traditional else self.simplified
+        return (key for key in dictionary if key != 'name')
+
+    def warmup(self):
+        """Loads the default dictionary unless a dictionary is already loaded."""
+        self.__init_dict_if_necessary()
+
     def lookup_with_simplified_chinese(self, string):
         self.__init_dict_if_necessary()
-        return self.__lookup(self.simplified, string)
+        return self.__lookup(self.simplified, string, Simplified)
     
     def lookup_with_traditional_chinese(self, string):
         self.__init_dict_if_necessary()
-        return self.__lookup(self.traditional, string)
+        return self.__lookup(self.traditional, string, Traditional)
     
-    def __lookup(self, dictionary, string):
+    def __lookup(self, dictionary, string, kind):
         if len(string) == 0:
             return []
         if string in dictionary:
             return dictionary[string]
-        return [Traditional(string, None, None)] if dictionary['name'] == 'traditional' else [Simplified(string, None, None)]
+        return [kind.miss(string)]
     
+    def lookup_prefix_with_simplified_chinese(self, prefix, *, limit=None):
+        """Returns the headwords starting with prefix, e.g. for autocompletion.
+
+        Args:
+            prefix (str): A Simplified Chinese string.
+            limit (int): The maximum number of headwords returned.
+
+        Returns:
+            A list of headwords in code point order, so shorter words come before
+            their extensions.
+        """
+        self.__init_dict_if_necessary()
+        return self.__prefix_index(False).keys_with_prefix(prefix, limit)
+
+    def lookup_prefix_with_traditional_chinese(self, prefix, *, limit=None):
+        """Returns the headwords starting with prefix. See lookup_prefix_with_simplified_chinese."""
+        self.__init_dict_if_necessary()
+        return self.__prefix_index(True).keys_with_prefix(prefix, limit)
+
+    def lookup_longest_prefix_with_simplified_chinese(self, string):
+        """Returns the longest headword which is a prefix of string, or None."""
+        self.__init_dict_if_necessary()
+        return self.__prefix_index(False).longest_prefix(string)
+
+    def lookup_longest_prefix_with_traditional_chinese(self, string):
+        """Returns the longest headword which is a prefix of string, or None."""
+        self.__init_dict_if_necessary()
+        return self.__prefix_index(True).longest_prefix(string)
+
+    def __prefix_index(self, traditional):
+        dictionary = self.traditional if traditional else self.simplified
+        if isinstance(dictionary, (CompiledIndex, EditedIndex)):
+            return dictionary
+        cached = self.__sorted_keys.get(traditional)
+        if cached is None or cached[0] is not dictionary:
+            cached = (dictionary, SortedKeys(key for key in dictionary if key != 'name'))
+            self.__sorted_keys[traditional] = cached
+        return cached[1]
+
+    def search_definitions(self, query, *, limit=10, traditional=False):
+        """Returns the entries whose English definitions best match the query.
+
+        Entries are ranked by BM25 over the words of their definitions. The index
+        is stored in compiled dictionaries, and built on first use otherwise. Edits
+        are applied to it (see add_entry).
+
+        Args:
+            query (str): English words, e.g. 'horse riding'.
+            limit (int): The maximum number of entries returned.
+            traditional (bool): If set to True, Traditional Chinese headwords and
+                lookup results are returned.
+
+        Returns:
+            A list of (headword, lookup result) pairs, best match first.
+        """
+        self.__init_dict_if_necessary()
+        found = self.__index('search', DefinitionIndex, DefinitionIndex.edit).search(query, limit)
+        return self.__resolve(((headword, ordinal) for headword, ordinal, _ in found), traditional)
+
+    def lookup_with_pinyin(self, query, *, limit=None, traditional=False):
+        """Returns the entries read as the pinyin query, most frequent words first.
+
+        The query may use tone numbers ('zhong1 guo2'), tone marks ('zhōngguó')
+        or no tones ('zhongguo'), and syllables may or may not be separated.
+        Omitted tones match any tone. The index is stored in compiled dictionaries,
+        and built on first use otherwise. Edits are applied to it (see add_entry).
+
+        Args:
+            query (str): A pinyin string.
+            limit (int): The maximum number of entries returned.
+            traditional (bool): If set to True, Traditional Chinese headwords and
+                lookup results are returned.
+
+        Returns:
+            A list of (headword, lookup result) pairs.
+        """
+        self.__init_dict_if_necessary()
+        index = self.__index('pinyin', PinyinIndex, lambda index, changes: index.edit(changes, self.__frequencies()))
+        return self.__resolve(index.search(query, limit), traditional)
+
+    def __resolve(self, found, traditional):
+        results = []
+        for headword, ordinal in found:
+            entry = self.simplified[headword][ordinal]
+            if traditional:
+                results.append((entry.match, Traditional(headword, entry.pinyin_codes, entry.definitions,
+                                                          rendered=(entry.pinyin_marks, entry.pinyin_numbers, entry.pinyin_toneless))))
+            else:
+                results.append((headword, entry))
+        return results
+
+    def __frequencies(self):
+        """Returns word frequencies from jieba's dictionary shipped with this package, if any."""
+        directory = os.path.abspath(os.path.dirname(__file__))
+        path = os.path.join(directory, 'data', 'dict.txt.big')
+        return PinyinIndex.frequencies(path) if os.path.exists(path) else {}
+
     def lookup_pinyin_with_simplified_chinese(self, string):
         self.__init_dict_if_necessary()
-        return self.__lookup_pinyin(self.simplified, string)
+        return self.__lookup_pinyin(False, string)
 
     def lookup_pinyin_with_traditional_chinese(self, string):
         self.__init_dict_if_necessary()
-        return self.__lookup_pinyin(self.traditional, string)
+        return self.__lookup_pinyin(True, string)
     
-    def __lookup_pinyin(self, dictionary, string):
+    def __lookup_pinyin(self, traditional, string):
         if len(string) > 1:
             raise errors.StringLengthError('Argument must be a single character: {}'.format(string))
-        
-        if not self.is_chinese_character(string):
-            return string
+        return self.__reading_table(traditional).convert(string)
 
-        if string in dictionary:
-            hanzi = dictionary[string][0] # Use the first one: MUST BE FIXED
-            return ''.join(map(self.__converter.prettify, hanzi.pinyin)).lower()
-        return string
+    def lookup_character_pinyin_with_simplified_chinese(self, string):
+        """Returns the string with each Chinese character replaced by its default reading.
+
+        The reading of a character is that of its first entry, with tone marks in
+        lowercase, as returned by lookup_pinyin_with_simplified_chinese(). Other
+        characters are kept as they are. The table of readings is stored in compiled
+        dictionaries, and built on first use otherwise. Edits are applied to it (see add_entry).
+        """
+        self.__init_dict_if_necessary()
+        return self.__reading_table(False).convert(string)
+
+    def lookup_character_pinyin_with_traditional_chinese(self, string):
+        """Returns the string with each Chinese character replaced by its default reading.
+        See lookup_character_pinyin_with_simplified_chinese."""
+        self.__init_dict_if_necessary()
+        return self.__reading_table(True).convert(string)
+
+    def __reading_table(self, traditional):
+        return self.__index('readings.trad' if traditional else 'readings.simp', ReadingTable, ReadingTable.edit)
+
+    def word_tables(self, *, traditional=False):
+        """Returns the (prefixes, suffixes) WordTables of the headwords, or None.
+
+        They are stored in compiled dictionaries; other dictionaries, and edited
+        ones, have none.
+        """
+        self.__init_dict_if_necessary()
+        dictionary = self.traditional if traditional else self.simplified
+        if not isinstance(dictionary, CompiledIndex):
+            return None
+        return self.__index('matcher.trad' if traditional else 'matcher.simp',
+                            lambda forward, backward: (WordTable(forward), WordTable(backward, reverse=True)))
+
+    def convert(self, text, *, to='simplified'):
+        """Converts a text between Traditional and Simplified Chinese.
+
+        Phrases whose conversion differs from that of their characters, like
+        頭髮 (头发) and 头发 (頭髮), are converted as a whole.
+
+        Args:
+            text (str): A Chinese text.
+            to (str): 'simplified' or 'traditional'.
+        """
+        return self.script_converter(to=to).convert(text)
+
+    def script_converter(self, *, to='simplified'):
+        """Returns the ScriptConverter of the dictionary into the given script.
+
+        It is stored in compiled dictionaries, and built on first use otherwise.
+        Edits are applied to it (see add_entry).
+        """
+        if to not in ('simplified', 'traditional'):
+            raise errors.InvalidScriptError('Script must be simplified or traditional: {}'.format(to))
+        self.__init_dict_if_necessary()
+        return self.__index('script.t2s' if to == 'simplified' else 'script.s2t', ScriptConverter, ScriptConverter.edit)
 
     def lookup_meaning_with_simplified_chinese(self, string):
         self.__init_dict_if_necessary()
@@ -177,19 +1094,253 @@ class Dictionary:
         return None
     
     def is_chinese_character(self, string):
-        chinese_chars = r'[\u4e00-\u9fff]'
-        return re.match(chinese_chars, string) is not None
+        """Returns whether the string starts with a CJK Unified Ideograph, including Extensions A and B."""
+        return len(string) > 0 and ReadingTable.covers(ord(string[0]))
 
-    def load_raw(self):
+    def load_raw(self, *, workers=None):
         directory = os.path.abspath(os.path.dirname(__file__))
         cedict = os.path.join(directory, 'data', 'cedict_ts.u8')
-        with open(cedict) as f:
-            self.traditional, self.simplified = self.__parse_data(f)
+        self.load(cedict, cache=False, workers=workers)
 
     def export(self, to):
-        data = {
-            'simplified': self.simplified,
-            'traditional': self.traditional
-        }
+        """Pickles the loaded dictionary in the format of data/cedict.pickle.
+
+        Compiled and edited mappings are copied into plain dicts first.
+        """
+        self.__init_dict_if_necessary()
+        data = {}
+        for name in ('simplified', 'traditional'):
+            dictionary = getattr(self, name)
+            data[name] = {key: dictionary[key] for key in dictionary if key != 'name'}
+            data[name]['name'] = name
         with open(to, 'wb') as f:
             pickle.dump(data, f)
+
+    def compile(self, to):
+        """Writes the loaded dictionary in the compiled format that load() opens with mmap.
+
+        Edits are written along with the other entries, and the journal of the
+        file is removed. If the file is the one loaded, it is opened again.
+        """
+        self.__init_dict_if_necessary()
+        writer = self.__lookup_tables()
+        for names, dictionary, build in self.__derivations().values():
+            for name, data in zip(names, build(dictionary)):
+                writer.add_section(name, data)
+        with self.__edit_lock:
+            writer.write(to)
+            journal = os.path.abspath(to) + self.journal_suffix
+            if os.path.exists(journal):
+                os.remove(journal)
+            if journal == self.__journal:
+                self.__open(to, journal=True)
+
+    def __lookup_tables(self):
+        writer = StoreWriter()
+        writer.add_section('traditional', self.__pack(self.traditional))
+        writer.add_section('simplified', self.__pack(self.simplified))
+        return writer
+
+    def __derivations(self):
+        """Returns the section names, source mapping and builder of each index derived from the entries."""
+        def word_tables(dictionary):
+            words = [key for key in dictionary if key != 'name']
+            return WordTable.build(words), WordTable.build(words, reverse=True)
+
+        traditional, simplified = self.traditional, self.simplified
+        return {
+            'search': (('search.docs', 'search.postings', 'search.stats'), simplified, DefinitionIndex.build),
+            'pinyin': (('pinyin',), simplified, lambda d: (PinyinIndex.build(d, self.__frequencies()),)),
+            'readings.trad': (('readings.trad',), traditional, lambda d: (ReadingTable.build(d),)),
+            'readings.simp': (('readings.simp',), simplified, lambda d: (ReadingTable.build(d),)),
+            'script.t2s': (('script.t2s',), traditional, lambda d: (ScriptConverter.build(d, self.__frequencies()),)),
+            'script.s2t': (('script.s2t',), simplified, lambda d: (ScriptConverter.build(d, self.__frequencies()),)),
+            'matcher.trad': (('matcher.fwd.trad', 'matcher.bwd.trad'), traditional, word_tables),
+            'matcher.simp': (('matcher.fwd.simp', 'matcher.bwd.simp'), simplified, word_tables),
+        }
+
+    def __index(self, key, make, edit=None):
+        """Returns a derived index of the entries, cached until they change.
+
+        The index of an edited mapping is that of its base, built once, with the
+        changes applied by edit(index, changes), so an edit costs about as much as
+        the edited headwords, like the edited mapping itself.
+
+        Args:
+            key (str): A key of __derivations().
+            make: A callable making the index from its sections.
+            edit: A callable returning an index with changes applied.
+        """
+        dictionary = self.__derivations()[key][1]
+        cached = self.__indexes.get(key)
+        if cached is None or cached[0] is not dictionary:
+            edited = isinstance(dictionary, EditedIndex)
+            base = dictionary.base if edited else dictionary
+            if cached is not None and cached[2] is base:
+                base_index = cached[3]
+            else:
+                base_index = make(*self.__derived(key))
+            index = edit(base_index, dictionary.changes) if edited else base_index
+            cached = (dictionary, index, base, base_index)
+            self.__indexes[key] = cached
+        return cached[1]
+
+    def __derived(self, key):
+        """Returns the sections of a derived index of the unedited entries.
+
+        They are read from the compiled file the entries were loaded from if
+        possible. Caches written by load() only hold the lookup tables, so the
+        sections missing from them are built and appended for the next load.
+        """
+        names, dictionary, build = self.__derivations()[key]
+        if isinstance(dictionary, EditedIndex):
+            dictionary = dictionary.base
+        store = self.__store
+        if store is None or not isinstance(dictionary, CompiledIndex):
+            return build(dictionary)
+        if self.__extendable and not all(name in store for name in names):
+            # Another process may have appended the sections since the file was opened.
+            try:
+                store = self.__store = Store(store.path)
+            except (OSError, errors.InvalidDictionaryError):
+                pass
+        if all(name in store for name in names):
+            return tuple(store.section(name) for name in names)
+
+        sections = build(dictionary)
+        if self.__extendable:
+            try:
+                self.__store = store.extend(zip(names, sections))
+            except OSError:
+                logger.warning('Could not append {} to the compiled cache {}.'.format(key, store.path))
+        return sections
+
+    def __pack(self, dictionary):
+        items = sorted(
+            (key.encode('utf-8'), Codec.encode(dictionary[key]))
+            for key in dictionary if key != 'name'
+        )
+        return pack_table(items)
+
+class DictionaryRegistry:
+    """Named stacks of dictionary files overlaid on a base dictionary.
+
+    Each file is loaded once per path, modification time and size, under a lock
+    of its own, shared by every registry, and unloaded when no stack registers it
+    any more. The dictionary of a stack is built on first use and reused until
+    one of its files or the base dictionary changes; files are checked at most
+    once every check_interval seconds.
+    """
+
+    check_interval = 1.0
+
+    # Files loaded for every registry, with the number of stacks registering them.
+    __files = {}
+    __users = {}
+    __path_locks = {}
+    __files_lock = threading.Lock()
+
+    def __init__(self, base):
+        """
+        Args:
+            base (Dictionary): The dictionary at the bottom of every stack.
+        """
+        self.base = base
+        self.__stacks = {}
+        self.__built = {}
+        self.__lock = threading.Lock()
+
+    def register(self, name, *paths):
+        """Registers a stack of dictionary files, the first taking precedence.
+
+        A stack registered under the same name is replaced.
+
+        Args:
+            name (str): The name of the stack.
+            paths (str): Paths to CC-CEDICT formatted files or compiled dictionaries.
+        """
+        paths = tuple(os.path.abspath(path) for path in paths)
+        with self.__lock:
+            replaced = self.__stacks.get(name, ())
+            self.__stacks[name] = paths
+            self.__built.pop(name, None)
+        self.__retain(paths)
+        self.__release(replaced)
+
+    def unregister(self, name):
+        """Unregisters a stack. Its files are unloaded unless another stack registers them."""
+        with self.__lock:
+            paths = self.__stacks.pop(name, ())
+            self.__built.pop(name, None)
+        self.__release(paths)
+
+    def __contains__(self, name):
+        return name in self.__stacks
+
+    def names(self):
+        return list(self.__stacks)
+
+    def get(self, name):
+        """Returns the Dictionary of the named stack."""
+        built = self.__built.get(name)
+        now = time.monotonic()
+        if built is not None and built[0] is self.base.simplified and now - built[1] < self.check_interval:
+            return built[3]
+
+        paths = self.__stacks.get(name)
+        if paths is None:
+            raise errors.InvalidKeyError('InvalidKeyError: {}'.format(name))
+        self.base.warmup()
+        signature = tuple(self.__stat(path) for path in paths)
+        with self.__lock:
+            built = self.__built.get(name)
+            if built is not None and built[0] is self.base.simplified and built[2] == signature:
+                built = self.__built[name] = built[:1] + (now,) + built[2:]
+                return built[3]
+
+        # Loaded without the lock, so other stacks are served meanwhile.
+        layers = tuple(self.__load(path, stat) for path, stat in zip(paths, signature))
+        built = (self.base.simplified, now, signature, self.base.overlay(*layers))
+        with self.__lock:
+            if self.__stacks.get(name) == paths:
+                self.__built[name] = built
+        return built[3]
+
+    @classmethod
+    def __retain(cls, paths):
+        with cls.__files_lock:
+            for path in paths:
+                cls.__users[path] = cls.__users.get(path, 0) + 1
+
+    @classmethod
+    def __release(cls, paths):
+        with cls.__files_lock:
+            for path in paths:
+                cls.__users[path] -= 1
+                if cls.__users[path] == 0:
+                    del cls.__users[path]
+                    cls.__files.pop(path, None)
+                    cls.__path_locks.pop(path, None)
+
+    @staticmethod
+    def __stat(path):
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    @classmethod
+    def __load(cls, path, stat):
+        """Returns the dictionary of a file, loading it under a lock of its own."""
+        with cls.__files_lock:
+            lock = cls.__path_locks.setdefault(path, threading.Lock())
+        with lock:
+            loaded = cls.__files.get(path)
+            if loaded is None or loaded[0] != stat:
+                logger.info('Loading the user dictionary {}.'.format(path))
+                dictionary = Dictionary()
+                dictionary.load(path)
+                loaded = (stat, dictionary)
+                with cls.__files_lock:
+                    # Not cached if every stack of the file was unregistered meanwhile.
+                    if path in cls.__users:
+                        cls.__files[path] = loaded
+        return loaded[1]
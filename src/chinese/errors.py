@@ -16,6 +16,13 @@ class InvalidArgumentTypeError(Error):
 class StringLengthError(Error):
     """Provided string's length is invalid."""
 
+# Dictionary
+class InvalidDictionaryError(Error):
+    """Provided dictionary file is broken or has an unsupported format."""
+
+class InvalidScriptError(Error):
+    """Provided script does not exist."""
+
 # Analizer
 class InvalidPlatformError(Error):
     """User's platform is not allowed to do some operations."""
@@ -24,4 +31,7 @@ class FileNotFoundError(Error):
     """File not found."""
 
 class InvalidKeyError(Error):
-    """Provided key is not in tokens."""
\ No newline at end of file
+    """Provided key is not in tokens."""
+
+class InvalidResultError(Error):
+    """Provided serialized result is broken or has an unsupported format."""
\ No newline at end of file
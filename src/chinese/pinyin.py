@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from array import array
+import threading
+
+from chinese.converter import Converter
+
+
+initials = {
+    'b': 'ㄅ', 'p': 'ㄆ', 'm': 'ㄇ', 'f': 'ㄈ', 'd': 'ㄉ', 't': 'ㄊ', 'n': 'ㄋ', 'l': 'ㄌ',
+    'g': 'ㄍ', 'k': 'ㄎ', 'h': 'ㄏ', 'j': 'ㄐ', 'q': 'ㄑ', 'x': 'ㄒ', 'zh': 'ㄓ', 'ch': 'ㄔ',
+    'sh': 'ㄕ', 'r': 'ㄖ', 'z': 'ㄗ', 'c': 'ㄘ', 's': 'ㄙ',
+}
+finals = {
+    'a': 'ㄚ', 'o': 'ㄛ', 'e': 'ㄜ', 'ai': 'ㄞ', 'ei': 'ㄟ', 'ao': 'ㄠ', 'ou': 'ㄡ', 'an': 'ㄢ',
+    'en': 'ㄣ', 'ang': 'ㄤ', 'eng': 'ㄥ', 'er': 'ㄦ', 'ong': 'ㄨㄥ',
+    'i': 'ㄧ', 'ia': 'ㄧㄚ', 'io': 'ㄧㄛ', 'ie': 'ㄧㄝ', 'iao': 'ㄧㄠ', 'iu': 'ㄧㄡ', 'ian': 'ㄧㄢ',
+    'in': 'ㄧㄣ', 'iang': 'ㄧㄤ', 'ing': 'ㄧㄥ', 'iong': 'ㄩㄥ',
+    'u': 'ㄨ', 'ua': 'ㄨㄚ', 'uo': 'ㄨㄛ', 'uai': 'ㄨㄞ', 'ui': 'ㄨㄟ', 'uan': 'ㄨㄢ', 'un': 'ㄨㄣ',
+    'uang': 'ㄨㄤ', 'ueng': 'ㄨㄥ',
+    'v': 'ㄩ', 've': 'ㄩㄝ', 'van': 'ㄩㄢ', 'vn': 'ㄩㄣ',
+}
+standalones = {'m': 'ㄇ', 'n': 'ㄋ', 'ng': 'ㄫ', 'hm': 'ㄏㄇ', 'hng': 'ㄏㄫ', 'ê': 'ㄝ', 'r': 'ㄦ'}
+zhuyin_tones = {1: '', 2: 'ˊ', 3: 'ˇ', 4: 'ˋ'}
+
+
+def to_zhuyin(syllable, tone=None):
+    """Returns the zhuyin (bopomofo) of a toneless pinyin syllable, or None.
+
+    Args:
+        syllable (str): A syllable like 'zhong', 'lu:' or 'lv'.
+        tone (int): A tone number from 1 to 5, or None.
+    """
+    syllable = syllable.lower().replace('u:', 'v').replace('ü', 'v')
+    if syllable in standalones:
+        zhuyin = standalones[syllable]
+    else:
+        initial = next((i for i in ('zh', 'ch', 'sh') if syllable.startswith(i)), syllable[:1])
+        if initial not in initials:
+            initial = ''
+        final = syllable[len(initial):]
+
+        if not initial and final[:1] in ('y', 'w'):
+            final = {'yi': 'i', 'yin': 'in', 'ying': 'ing', 'yu': 'v', 'yue': 've', 'yuan': 'van',
+                     'yun': 'vn', 'yong': 'iong', 'wu': 'u', 'wei': 'ui', 'wen': 'un',
+                     'weng': 'ueng'}.get(final, 'i' + final[1:] if final[0] == 'y' else 'u' + final[1:])
+            if final == 'iou':
+                final = 'iu'
+        elif initial in ('j', 'q', 'x') and final[:1] == 'u':
+            final = 'v' + final[1:]
+
+        if initial in ('zh', 'ch', 'sh', 'r', 'z', 'c', 's') and final == 'i':
+            zhuyin = initials[initial]
+        elif final in finals:
+            zhuyin = initials.get(initial, '') + finals[final]
+        else:
+            return None
+
+    if tone == 5:
+        return '˙' + zhuyin
+    return zhuyin + zhuyin_tones.get(tone, '')
+
+class PinyinTable:
+    """Interns pinyin syllables as small integers and renders them from shared tables.
+
+    A syllable is coded as the id of its toneless form, spelled as in the
+    dictionary, shifted left by 3 bits and combined with its tone number (0 when
+    it has none). Every rendering of a code is computed once per process, so
+    rendering a word only concatenates strings.
+    """
+
+    typecode = 'I'
+
+    def __init__(self):
+        self.__ids = {}
+        self.__numbers = []
+        self.__marks = []
+        self.__toneless = []
+        self.__zhuyin = []
+        self.__lock = threading.Lock()
+        self.__converter = Converter()
+
+    def code(self, syllable):
+        """Returns the code of a syllable with an optional tone number, like 'zhong1'."""
+        if syllable and syllable[-1] in '12345':
+            base, tone = syllable[:-1], int(syllable[-1])
+        else:
+            base, tone = syllable, 0
+        i = self.__ids.get(base)
+        if i is None:
+            i = self.__intern(base)
+        return i << 3 | tone
+
+    def __intern(self, base):
+        with self.__lock:
+            if base in self.__ids:
+                return self.__ids[base]
+            for tone in range(8):
+                numbered = base + str(tone) if 1 <= tone <= 5 else base
+                self.__numbers.append(numbered)
+                self.__marks.append(self.__converter.prettify(numbered))
+                self.__toneless.append(base)
+                # Without a tone number, e.g. the latin letters of CC-CEDICT, it is not pinyin.
+                self.__zhuyin.append(to_zhuyin(base, tone) if 1 <= tone <= 5 else None)
+            i = self.__ids[base] = len(self.__ids)
+            return i
+
+    def pack(self, pinyin):
+        """Returns an array of the codes of a list of syllables, or None for None."""
+        if pinyin is None:
+            return None
+        code = self.code
+        return array(self.typecode, [code(syllable) for syllable in pinyin])
+
+    def numbers(self, codes):
+        """Returns the list of syllables with tone numbers, like ['zhong1', 'guo2']."""
+        numbers = self.__numbers
+        return [numbers[code] for code in codes]
+
+    def marks(self, codes, separator=''):
+        marks = self.__marks
+        return separator.join([marks[code] for code in codes])
+
+    def toneless(self, codes, separator=''):
+        toneless = self.__toneless
+        return separator.join([toneless[code] for code in codes])
+
+    def zhuyin(self, codes, separator=' '):
+        """Returns the zhuyin of the syllables, keeping syllables which have none as they are."""
+        zhuyin, numbers = self.__zhuyin, self.__numbers
+        return separator.join([zhuyin[code] or numbers[code] for code in codes])
+
+table = PinyinTable()
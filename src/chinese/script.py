@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from collections import Counter
+import copy
+import re
+
+from chinese.store import Table, pack_table
+
+
+class ScriptConverter:
+    """Converts text from one Chinese script to the other, e.g. Traditional to Simplified.
+
+    Characters are converted by str.translate into their most common counterpart
+    among the dictionary's headwords, weighted by word frequency. Phrases converted
+    otherwise, like 头发 (頭髮), take priority: every occurrence of a character which
+    some phrase converts differently is checked against the phrases around it, the
+    longest one winning.
+
+    An edited copy, returned by edit(), converts the edited headwords of several
+    characters as their entries now say. Characters keep the conversions voted
+    for by the dictionary the converter was built from.
+    """
+
+    # Entries like 聯係 (variant of 聯繫) are not the conversion of their headword.
+    variant = re.compile(r'^(?:[\w-]+ )?variant of ')
+
+    def __init__(self, buffer):
+        """
+        Args:
+            buffer: A buffer returned by build().
+        """
+        table = Table(buffer)
+        characters, phrases = {}, {}
+        for i in range(len(table)):
+            source, target = table.key(i).decode('utf-8'), table.value(i).decode('utf-8')
+            if len(source) == 1:
+                characters[source] = target
+            else:
+                phrases[source] = target
+        self.__characters = characters
+        self.__table = str.maketrans(characters)
+        self.__phrases = phrases
+        self.max_length = 1
+        self.__windows, self.__bigrams, self.__phrase_characters = {}, set(), set()
+        self.__ambiguous = None
+        self.__index(phrases)
+
+    def __index(self, phrases):
+        """Adds phrases to the windows of the characters they convert differently."""
+        self.max_length = max(self.max_length, max(map(len, phrases), default=1))
+        # For each character a phrase converts differently, the lengths of such phrases
+        # and its positions in them, longest first, then starting leftmost.
+        windows = {}
+        for source, target in phrases.items():
+            for k, (c, converted) in enumerate(zip(source, target)):
+                if self.__characters.get(c, c) != converted:
+                    windows.setdefault(c, set()).add((-len(source), -k))
+                    self.__bigrams.update(bigram for bigram in (source[max(k - 1, 0):k + 1], source[k:k + 2])
+                                          if len(bigram) == 2)
+        for c, window in windows.items():
+            window.update((-n, -k) for n, k in self.__windows.get(c, ()))
+            self.__windows[c] = [(-n, -k) for n, k in sorted(window)]
+        if windows:
+            self.__ambiguous = re.compile('[{}]'.format(re.escape(''.join(sorted(self.__windows)))))
+        self.__phrase_characters.update(''.join(phrases))
+
+    @classmethod
+    def build(cls, dictionary, frequencies=None):
+        """Returns the buffer for a mapping of headwords to entries in the source script.
+
+        The match of the first entry of each headword which is not a variant of
+        another is its conversion. Each character takes the conversion with the
+        most votes of the headwords containing it, a headword of several
+        characters voting with its frequency plus one.
+
+        Args:
+            dictionary: A mapping of headwords to lookup results.
+            frequencies (dict): A mapping of words to frequencies, as returned by
+                PinyinIndex.frequencies().
+        """
+        frequencies = frequencies or {}
+        pairs, votes = [], {}
+        for key in dictionary:
+            if key == 'name':
+                continue
+            target = cls.__conversion(dictionary[key])
+            if len(target) != len(key):
+                continue
+            pairs.append((key, target))
+            # The frequency of a character is shared by all its entries, so it does not count.
+            weight = frequencies.get(key, 0) + 1 if len(key) > 1 else 1
+            for c, converted in zip(key, target):
+                votes.setdefault(c, Counter())[converted] += weight
+
+        characters = {c: counter.most_common(1)[0][0] for c, counter in votes.items()}
+        characters = {c: converted for c, converted in characters.items() if converted != c}
+        table = str.maketrans(characters)
+        items = list(characters.items())
+        items += [(source, target) for source, target in pairs
+                  if len(source) > 1 and source.translate(table) != target]
+        return pack_table(sorted((source.encode('utf-8'), target.encode('utf-8')) for source, target in items))
+
+    def edit(self, changes):
+        """Returns a copy of the converter in which edited headwords have new entries.
+
+        Args:
+            changes (dict): The edited headwords and all their entries, an empty
+                list for a removed headword.
+        """
+        edited = copy.copy(self)
+        edited.__phrases = dict(self.__phrases)
+        edited.__windows = dict(self.__windows)
+        edited.__bigrams = set(self.__bigrams)
+        edited.__phrase_characters = set(self.__phrase_characters)
+        added = {}
+        for key, entries in changes.items():
+            if len(key) < 2:
+                continue
+            edited.__phrases.pop(key, None)
+            if not entries:
+                continue
+            target = self.__conversion(entries)
+            if len(target) == len(key) and key.translate(self.__table) != target:
+                added[key] = target
+        edited.__phrases.update(added)
+        edited.__index(added)
+        return edited
+
+    @classmethod
+    def __conversion(cls, entries):
+        """Returns the match of the first entry which is not a variant, or of the first entry."""
+        for entry in entries:
+            if not (entry.definitions and cls.variant.match(entry.definitions[0])):
+                return entry.match
+        return entries[0].match
+
+    def convert(self, text):
+        """Returns the converted text."""
+        if self.__ambiguous is None:
+            return text.translate(self.__table)
+
+        table, phrases, windows, bigrams = self.__table, self.__phrases, self.__windows, self.__bigrams
+        converted = []
+        # Text before position is converted; phrases may not start before covered.
+        position = covered = 0
+        for match in self.__ambiguous.finditer(text):
+            i = match.start()
+            if i < covered or (text[i - 1:i + 1] not in bigrams and text[i:i + 2] not in bigrams):
+                continue
+            for length, k in windows[match.group()]:
+                start = i - k
+                if start < covered:
+                    continue
+                phrase = text[start:start + length]
+                if phrase in phrases:
+                    converted.append(text[position:start].translate(table))
+                    converted.append(phrases[phrase])
+                    position = covered = start + length
+                    break
+        converted.append(text[position:].translate(table))
+        return ''.join(converted)
+
+    def convert_stream(self, stream, max_length=65536):
+        """Converts a text of any size piece by piece.
+
+        The stream is read incrementally and cut after characters which no phrase
+        contains, like newlines, so the result is the same as converting the whole
+        text at once.
+
+        Args:
+            stream: An iterable of strings, or a file object.
+            max_length (int): The maximum number of characters read at a time.
+                Text without any place to cut is cut at this length.
+
+        Yields:
+            Converted strings.
+        """
+        if hasattr(stream, 'read'):
+            read = stream.read
+            stream = iter(lambda: read(max_length), '')
+
+        buffer = ''
+        for chunk in stream:
+            buffer += chunk
+            cut = self.__cut(buffer)
+            if cut == 0 and len(buffer) > max_length:
+                cut = len(buffer) - self.max_length
+            if cut > 0:
+                yield self.convert(buffer[:cut])
+                buffer = buffer[cut:]
+        if buffer:
+            yield self.convert(buffer)
+
+    def __cut(self, buffer):
+        """Returns the position after the last character which no phrase contains, or 0."""
+        for i in range(len(buffer) - 1, -1, -1):
+            if buffer[i] not in self.__phrase_characters:
+                return i + 1
+        return 0
@@ -0,0 +1,445 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from array import array
+import bisect
+from collections import Counter
+import copy
+import heapq
+import math
+import os
+import re
+import struct
+
+from chinese.converter import Converter
+from chinese.store import Table, pack_table
+
+
+class DefinitionIndex:
+    """An inverted index over the English definitions of dictionary entries.
+
+    Every entry is a document identified by its headword and its position among
+    the entries of that headword. Postings hold the BM25 weight of the term in
+    each document, computed at build time. Every posting list is stored twice:
+    sorted by weight, which a query walks until no unseen document can reach the
+    top results, and sorted by document, where the other terms' weights of a
+    document are found by bisection. Terms are lowercased alphanumeric words
+    without stemming.
+
+    An edited copy, returned by edit(), leaves out the documents of the edited
+    headwords and searches their new entries apart, weighted with the statistics
+    of the index.
+    """
+
+    k1 = 1.2
+    b = 0.75
+    word = re.compile(r'[a-z0-9]+')
+
+    __stats = struct.Struct('<d')
+
+    def __init__(self, docs, postings, stats):
+        """
+        Args:
+            docs: A buffer built by build() mapping document ids to entries.
+            postings: A buffer built by build() mapping terms to postings.
+            stats: A buffer built by build() holding the average document length.
+        """
+        self.__docs = Table(docs)
+        self.__postings = Table(postings)
+        self.__average = self.__stats.unpack_from(stats, 0)[0]
+        self.__excluded = frozenset()
+        self.__edited = {}
+
+    @classmethod
+    def tokenize(cls, text):
+        return cls.word.findall(text.lower())
+
+    @classmethod
+    def build(cls, dictionary):
+        """Returns the docs, postings and stats buffers for a mapping of headwords to entries."""
+        docs, frequencies = [], []
+        for headword in sorted(key for key in dictionary if key != 'name'):
+            for ordinal, entry in enumerate(dictionary[headword]):
+                docs.append((struct.pack('>I', len(docs)), '{}\x1f{}'.format(headword, ordinal).encode('utf-8')))
+                frequencies.append(Counter(cls.tokenize(' '.join(entry.definitions or []))))
+
+        lengths = [sum(tf.values()) for tf in frequencies]
+        # Definitions without any words, e.g. only in Chinese, have no length to normalize.
+        average = (sum(lengths) / len(lengths) if lengths else 0.0) or 1.0
+        postings = {}
+        for doc, tf in enumerate(frequencies):
+            for term, weight in cls.__weights(tf, lengths[doc], average):
+                postings.setdefault(term, []).append((doc, weight))
+
+        items = []
+        for term, posting in postings.items():
+            idf = cls.__idf(len(docs), len(posting))
+            # The sort is stable, so documents of equal weight stay in id order.
+            value = b''
+            for ordered in (sorted(posting, key=lambda p: -p[1]), posting):
+                ids = array('I', (doc for doc, _ in ordered))
+                weights = array('f', (idf * weight for _, weight in ordered))
+                value += ids.tobytes() + weights.tobytes()
+            items.append((term.encode('utf-8'), value))
+        items.sort()
+        return pack_table(docs), pack_table(items), cls.__stats.pack(average)
+
+    @classmethod
+    def __weights(cls, tf, length, average):
+        """Yields the BM25 weights of the terms of a document without their idf."""
+        norm = cls.k1 * (1 - cls.b + cls.b * length / average)
+        for term, count in tf.items():
+            yield term, count * (cls.k1 + 1) / (count + norm)
+
+    @staticmethod
+    def __idf(count, frequency):
+        return math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+
+    def edit(self, changes):
+        """Returns a copy of the index in which edited headwords have new entries.
+
+        Args:
+            changes (dict): The edited headwords and all their entries, an empty
+                list for a removed headword.
+        """
+        edited = copy.copy(self)
+        excluded = set(self.__excluded)
+        postings = {term: [posting for posting in posting_list if posting[0] not in changes]
+                    for term, posting_list in self.__edited.items()}
+        for headword, entries in changes.items():
+            excluded.update(self.__docs_of(headword))
+            for ordinal, entry in enumerate(entries):
+                tf = Counter(self.tokenize(' '.join(entry.definitions or [])))
+                for term, weight in self.__weights(tf, sum(tf.values()), self.__average):
+                    i = self.__postings.find(term.encode('utf-8'))
+                    frequency = len(self.__postings.value(i)) // 16 if i >= 0 else 0
+                    weight *= self.__idf(len(self.__docs), frequency)
+                    postings.setdefault(term, []).append((headword, ordinal, weight))
+        edited.__excluded = frozenset(excluded)
+        edited.__edited = postings
+        return edited
+
+    def __docs_of(self, headword):
+        """Returns the range of the ids of the documents of a headword."""
+        # Documents are numbered in headword order, and their values start with the headword.
+        key = headword.encode('utf-8')
+        bounds = []
+        for target in (key + b'\x1f', key + b'\x20'):
+            lo, hi = 0, len(self.__docs)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if bytes(self.__docs.value(mid)) < target:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            bounds.append(lo)
+        return range(*bounds)
+
+    def search(self, query, limit=10):
+        """Returns up to limit (headword, ordinal, score) tuples, best first."""
+        found = self.__search(query, limit)
+        if self.__edited:
+            scores = {}
+            for term in set(self.tokenize(query)):
+                for headword, ordinal, weight in self.__edited.get(term, ()):
+                    scores[headword, ordinal] = scores.get((headword, ordinal), 0.0) + weight
+            found += [(headword, ordinal, score) for (headword, ordinal), score in scores.items()]
+            found = heapq.nsmallest(limit, found, key=lambda result: (-result[2], result[0], result[1]))
+        return found
+
+    def __search(self, query, limit):
+        postings = []
+        for term in set(self.tokenize(query)):
+            i = self.__postings.find(term.encode('utf-8'))
+            if i >= 0:
+                value = memoryview(self.__postings.value(i))
+                n = len(value) // 16
+                postings.append([value[4 * k * n:4 * (k + 1) * n].cast(code) for k, code in enumerate('IfIf')])
+        if not postings or limit <= 0:
+            return []
+
+        # The threshold algorithm: take the postings by weight, always from the
+        # list with the highest next weight, score every newly seen document in
+        # full and stop once the limit-th score beats the sum of the next
+        # weights, the best an unseen document can reach. Lists of common words
+        # have flat weights and would be walked deep, so past a budget of scored
+        # documents summing the postings is cheaper.
+        best, seen, excluded = [], set(), self.__excluded
+        budget = sum(len(ids) for ids, _, _, _ in postings) // (16 * len(postings))
+        positions = [0] * len(postings)
+        frontier = [(-weights[0], k) for k, (_, weights, _, _) in enumerate(postings)]
+        heapq.heapify(frontier)
+        while frontier:
+            _, k = heapq.heappop(frontier)
+            ids, weights, _, _ = postings[k]
+            position = positions[k]
+            positions[k] += 1
+            if position + 1 < len(ids):
+                heapq.heappush(frontier, (-weights[position + 1], k))
+            doc = ids[position]
+            if doc not in seen and doc not in excluded:
+                seen.add(doc)
+                score = weights[position]
+                for other, _, doc_ids, doc_weights in postings:
+                    if other is not ids:
+                        j = bisect.bisect_left(doc_ids, doc)
+                        if j < len(doc_ids) and doc_ids[j] == doc:
+                            score += doc_weights[j]
+                if len(best) < limit:
+                    heapq.heappush(best, (score, -doc))
+                elif (score, -doc) > best[0]:
+                    heapq.heapreplace(best, (score, -doc))
+            if len(best) == limit and best[0][0] > -sum(weight for weight, _ in frontier):
+                break
+            if len(seen) > budget:
+                best = self.__score_all(postings, limit, best[0][0] if len(best) == limit else 0.0, excluded)
+                break
+
+        results = []
+        for score, doc in sorted(best, reverse=True):
+            headword, ordinal = self.__docs.value(-doc).decode('utf-8').split('\x1f')
+            results.append((headword, int(ordinal), score))
+        return results
+
+    @staticmethod
+    def __score_all(postings, limit, threshold, excluded):
+        # Only documents scoring at least the threshold are needed. Such a
+        # document has in every list a weight of at least the threshold less the
+        # other lists' largest weights, so only the heads of the lists above that
+        # are read. A list whose absence alone keeps a document below the
+        # threshold is required, and the candidates are then the documents in
+        # every required head. Otherwise lists whose largest weights together
+        # stay below the threshold cannot make a candidate on their own, and are
+        # only searched for the documents of the other lists.
+        top = sum(weights[0] for _, weights, _, _ in postings)
+        heads, required = [], None
+        for ids, weights, _, _ in postings:
+            rest = top - weights[0]
+            cutoff = threshold - rest - 1e-4
+            lo, hi = 0, len(weights)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if weights[mid] < cutoff:
+                    hi = mid
+                else:
+                    lo = mid + 1
+            heads.append((ids[:lo], weights[:lo], rest))
+            if rest + 1e-4 < threshold:
+                required = set(ids[:lo]) if required is None else required.intersection(ids[:lo])
+
+        if required is None:
+            heads.sort(key=lambda head: -head[2])
+            partial, bound = {}, 0.0
+            for ids, weights, rest in heads:
+                if bound + top - rest + 1e-4 < threshold:
+                    bound += top - rest
+                elif partial:
+                    for doc, weight in zip(ids, weights):
+                        partial[doc] = partial.get(doc, 0.0) + weight
+                else:
+                    partial = dict(zip(ids, weights))
+            if not bound:
+                return heapq.nlargest(limit, ((score, -doc) for doc, score in partial.items() if doc not in excluded))
+            required = [doc for doc, score in partial.items() if score + bound + 1e-4 >= threshold]
+
+        scores = {}
+        for doc in required:
+            if doc in excluded:
+                continue
+            score = 0.0
+            for _, _, doc_ids, doc_weights in postings:
+                j = bisect.bisect_left(doc_ids, doc)
+                if j < len(doc_ids) and doc_ids[j] == doc:
+                    score += doc_weights[j]
+            scores[doc] = score
+        return heapq.nlargest(limit, ((score, -doc) for doc, score in scores.items()))
+
+class PinyinIndex:
+    """An index from pinyin to dictionary entries.
+
+    Entries are keyed by their toneless pinyin with syllables run together, e.g.
+    'zhongguo', so queries do not depend on syllable boundaries. Tones given in
+    a query, as numbers or as tone marks, then filter the candidates; omitted
+    tones match any tone, and explicit separators such as in "xi'an" must fall on
+    syllable boundaries. Candidates of a key are stored ranked by a word
+    frequency prior. 'ü' and CC-CEDICT's 'u:' are both written 'v'.
+
+    An edited copy, returned by edit(), ranks the entries of the edited headwords
+    among the stored candidates in place of their old ones.
+    """
+
+    separators = " '-·"
+    marks = {toned: (vowel, tone)
+             for vowel, toned_vowels in Converter.toned_vowels.items() if vowel.islower()
+             for tone, toned in toned_vowels.items()}
+    marks.update({'ǖ': ('v', 1), 'ǘ': ('v', 2), 'ǚ': ('v', 3), 'ǜ': ('v', 4), 'ü': ('v', None)})
+
+    __frequencies = {}
+
+    def __init__(self, buffer):
+        self.__table = Table(buffer)
+        self.__changes = {}
+        self.__groups = {}
+        self.__ranking = {}
+
+    @classmethod
+    def frequencies(cls, path):
+        """Returns a dict mapping words to frequencies read from a jieba dictionary file.
+
+        The result is cached for each path and modification time.
+        """
+        key = (path, os.path.getmtime(path))
+        if key not in cls.__frequencies:
+            frequencies = {}
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    fields = line.split(' ')
+                    if len(fields) >= 2 and fields[1].isdigit():
+                        frequencies[fields[0]] = int(fields[1])
+            cls.__frequencies = {key: frequencies}
+        return cls.__frequencies[key]
+
+    @classmethod
+    def split(cls, syllable):
+        """Returns the normalized toneless syllable and its tone number, or None."""
+        syllable = syllable.lower().replace('u:', 'v')
+        if syllable and syllable[-1].isdigit():
+            return syllable[:-1], int(syllable[-1])
+        return syllable, None
+
+    @classmethod
+    def key(cls, pinyin):
+        return ''.join(cls.split(syllable)[0] for syllable in pinyin)
+
+    @classmethod
+    def analyze(cls, pinyin):
+        """Returns the tones and syllable boundaries of numbered pinyin syllables.
+
+        Returns:
+            A dict mapping the positions in the toneless key where a syllable ends
+            to its tone number, a dict mapping the positions of the vowels carrying
+            a tone mark to the tone, and the set of syllable boundaries.
+        """
+        numbers, marks, boundaries = {}, {}, set()
+        position = 0
+        for syllable in pinyin:
+            base, tone = cls.split(syllable)
+            if tone is not None:
+                numbers[position + len(base)] = tone
+                vowel = cls.__marked_vowel(base)
+                if vowel is not None and tone in Converter.tones:
+                    marks[position + vowel] = tone
+            position += len(base)
+            boundaries.add(position)
+        return numbers, marks, boundaries
+
+    @staticmethod
+    def __marked_vowel(base):
+        # The same rule as Converter.prettify.
+        for vowel in ('a', 'e', 'ou'):
+            if vowel in base:
+                return base.index(vowel)
+        for i in range(len(base) - 1, -1, -1):
+            if base[i] in 'iouv':
+                return i
+        return None
+
+    @classmethod
+    def parse_query(cls, query):
+        """Returns the toneless key of the query, followed by its tones and
+        explicit syllable boundaries like analyze()."""
+        key, numbers, marks, boundaries = [], {}, {}, set()
+        query = query.lower().replace('u:', 'v')
+        for c in query:
+            if c in cls.separators:
+                if key:
+                    boundaries.add(len(key))
+                continue
+            if c.isdigit():
+                numbers[len(key)] = int(c)
+            elif c in cls.marks:
+                vowel, tone = cls.marks[c]
+                if tone is not None:
+                    marks[len(key)] = tone
+                key.append(vowel)
+            else:
+                key.append(c)
+        return ''.join(key), numbers, marks, boundaries
+
+    @classmethod
+    def build(cls, dictionary, frequencies):
+        """Returns the buffer for a mapping of headwords to entries.
+
+        Args:
+            frequencies: A dict mapping words to their frequencies, used for ranking.
+        """
+        groups = {}
+        for headword in (key for key in dictionary if key != 'name'):
+            for ordinal, entry in enumerate(dictionary[headword]):
+                if entry.pinyin:
+                    rank = cls.__rank(headword, ordinal, frequencies)
+                    groups.setdefault(cls.key(entry.pinyin), []).append((rank, ' '.join(entry.pinyin)))
+
+        items = []
+        for key, candidates in groups.items():
+            candidates.sort()
+            value = '\x1e'.join('{}\x1f{}\x1f{}'.format(rank[2], rank[3], pinyin) for rank, pinyin in candidates)
+            items.append((key.encode('utf-8'), value.encode('utf-8')))
+        items.sort()
+        return pack_table(items)
+
+    @staticmethod
+    def __rank(headword, ordinal, frequencies):
+        return -frequencies.get(headword, 0), len(headword), headword, ordinal
+
+    def edit(self, changes, frequencies):
+        """Returns a copy of the index in which edited headwords have new entries.
+
+        Args:
+            changes (dict): The edited headwords and all their entries, an empty
+                list for a removed headword.
+            frequencies: The dict of word frequencies the index was built with.
+        """
+        edited = copy.copy(self)
+        changes = {**self.__changes, **changes}
+        groups = {}
+        for headword, entries in changes.items():
+            for ordinal, entry in enumerate(entries):
+                if entry.pinyin:
+                    rank = self.__rank(headword, ordinal, frequencies)
+                    groups.setdefault(self.key(entry.pinyin), []).append((rank, ' '.join(entry.pinyin)))
+        edited.__changes, edited.__groups, edited.__ranking = changes, groups, frequencies
+        return edited
+
+    def __candidates(self, key):
+        """Returns the (headword, ordinal, pinyin) candidates of a toneless key, best first."""
+        i = self.__table.find(key.encode('utf-8'))
+        candidates = []
+        if i >= 0:
+            for candidate in self.__table.value(i).decode('utf-8').split('\x1e'):
+                headword, ordinal, pinyin = candidate.split('\x1f')
+                candidates.append((headword, int(ordinal), pinyin))
+        if self.__changes:
+            ranked = [(self.__rank(headword, ordinal, self.__ranking), pinyin)
+                      for headword, ordinal, pinyin in candidates if headword not in self.__changes]
+            ranked += self.__groups.get(key, [])
+            ranked.sort()
+            candidates = [(rank[2], rank[3], pinyin) for rank, pinyin in ranked]
+        return candidates
+
+    def search(self, query, limit=None):
+        """Returns up to limit (headword, ordinal) pairs matching the query, best first."""
+        key, numbers, marks, boundaries = self.parse_query(query)
+        if not key:
+            return []
+
+        results = []
+        for headword, ordinal, pinyin in self.__candidates(key):
+            candidate_numbers, candidate_marks, candidate_boundaries = self.analyze(pinyin.split(' '))
+            if all(candidate_numbers.get(p) == t for p, t in numbers.items()) and \
+                    all(candidate_marks.get(p) == t for p, t in marks.items()) and \
+                    boundaries <= candidate_boundaries:
+                results.append((headword, ordinal))
+                if limit is not None and len(results) >= limit:
+                    break
+        return results
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from array import array
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+import chinese.errors as errors
+
+
+MAGIC = b'CNDICT\x00\x00'
+VERSION = 4
+
+_HEADER = struct.Struct('<8sIIB7x')
+_SECTION = struct.Struct('<16sQQ')
+_ALIGNMENT = 8
+
+
+def cache_directory(*parts):
+    """Returns a directory for on-disk caches, creating it if necessary.
+
+    The base directory is $CHINESE_CACHE_DIR, or `chinese` under $XDG_CACHE_HOME
+    (~/.cache by default). The system temporary directory is used if the
+    directory cannot be created.
+    """
+    base = os.environ.get('CHINESE_CACHE_DIR')
+    if not base:
+        xdg = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        base = os.path.join(xdg, 'chinese')
+    directory = os.path.join(base, *parts)
+    try:
+        os.makedirs(directory, exist_ok=True)
+    except OSError:
+        directory = os.path.join(tempfile.gettempdir(), 'chinese', *parts)
+        os.makedirs(directory, exist_ok=True)
+    return directory
+
+class StoreWriter:
+    """Builds a compiled store made of named, 8-byte aligned binary sections."""
+
+    def __init__(self):
+        self.__sections = []
+
+    def add_section(self, name, data):
+        if len(name.encode('ascii')) > 16:
+            raise errors.InvalidArgumentTypeError('Section name is too long: {}'.format(name))
+        self.__sections.append((name, bytes(data)))
+
+    def write(self, to):
+        """Writes the store to a temporary file and atomically moves it to `to`."""
+        offset = self.__align(_HEADER.size + _SECTION.size * len(self.__sections))
+        table = []
+        for name, data in self.__sections:
+            table.append(_SECTION.pack(name.encode('ascii'), offset, len(data)))
+            offset = self.__align(offset + len(data))
+
+        header = _HEADER.pack(MAGIC, VERSION, len(self.__sections), sys.byteorder == 'little')
+        tmp = '{}.{}.tmp'.format(to, os.getpid())
+        with open(tmp, 'wb') as f:
+            f.write(header)
+            f.write(b''.join(table))
+            for _, data in self.__sections:
+                f.write(b'\x00' * (self.__align(f.tell()) - f.tell()))
+                f.write(data)
+        os.replace(tmp, to)
+
+    @staticmethod
+    def __align(n):
+        return (n + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+class Store:
+    """A read-only, memory-mapped view over a compiled store.
+
+    The file is mapped with mmap, so every process opening the same store shares
+    the pages through the OS page cache instead of holding a private copy.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.__mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.__buffer = memoryview(self.__mmap)
+        self.__sections = self.__read_sections()
+
+    @classmethod
+    def is_compiled(cls, path):
+        """Returns whether the file at path starts with the compiled store's magic number."""
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+
+    def __read_sections(self):
+        if len(self.__buffer) < _HEADER.size:
+            raise errors.InvalidDictionaryError('InvalidDictionaryError: {}'.format(self.path))
+        magic, version, count, little = _HEADER.unpack_from(self.__buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise errors.InvalidDictionaryError('InvalidDictionaryError: {}'.format(self.path))
+        if bool(little) != (sys.byteorder == 'little'):
+            raise errors.InvalidDictionaryError('Byte order mismatch: {}'.format(self.path))
+
+        sections = {}
+        for i in range(count):
+            name, offset, length = _SECTION.unpack_from(self.__buffer, _HEADER.size + _SECTION.size * i)
+            sections[name.rstrip(b'\x00').decode('ascii')] = (offset, length)
+        return sections
+
+    def __contains__(self, name):
+        return name in self.__sections
+
+    def section(self, name):
+        """Returns a zero-copy memoryview of the named section."""
+        if name not in self.__sections:
+            raise errors.InvalidDictionaryError('Missing section {}: {}'.format(name, self.path))
+        offset, length = self.__sections[name]
+        return self.__buffer[offset:offset + length]
+
+    def extend(self, sections):
+        """Rewrites the file with (name, data) sections added and returns it opened again.
+
+        The file is replaced atomically, so this and other mappings of the old file
+        stay valid.
+        """
+        writer = StoreWriter()
+        for name in self.__sections:
+            writer.add_section(name, self.section(name))
+        for name, data in sections:
+            writer.add_section(name, data)
+        writer.write(self.path)
+        return Store(self.path)
+
+def pack_table(items):
+    """Packs sorted (key, value) pairs of bytes into a buffer readable by Table.
+
+    Layout: entry count, key offsets, value offsets, keys blob and values blob.
+    Offsets are uint32 and relative to the start of their blob.
+    """
+    key_offsets, value_offsets = array('I', [0]), array('I', [0])
+    keys, values = [], []
+    for key, value in items:
+        keys.append(key)
+        values.append(value)
+        key_offsets.append(key_offsets[-1] + len(key))
+        value_offsets.append(value_offsets[-1] + len(value))
+
+    return b''.join([
+        struct.pack('<I4x', len(keys)),
+        key_offsets.tobytes(),
+        value_offsets.tobytes(),
+        b''.join(keys),
+        b''.join(values),
+    ])
+
+class Table:
+    """A read-only table of bytes keys sorted in ascending order, searched by bisection."""
+
+    def __init__(self, buffer):
+        buffer = memoryview(buffer)
+        count = struct.unpack_from('<I', buffer, 0)[0]
+        width = (count + 1) * 4
+        start = 8
+        self.__key_offsets = buffer[start:start + width].cast('I')
+        start += width
+        self.__value_offsets = buffer[start:start + width].cast('I')
+        start += width
+        self.__keys = buffer[start:start + self.__key_offsets[count]]
+        start += self.__key_offsets[count]
+        self.__values = buffer[start:start + self.__value_offsets[count]]
+        self.__count = count
+
+    def __len__(self):
+        return self.__count
+
+    def key(self, i):
+        return bytes(self.__keys[self.__key_offsets[i]:self.__key_offsets[i + 1]])
+
+    def value(self, i):
+        return bytes(self.__values[self.__value_offsets[i]:self.__value_offsets[i + 1]])
+
+    def bisect_left(self, key, lo=0, hi=None):
+        """Returns the first index whose key is not less than the given key."""
+        hi = self.__count if hi is None else hi
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def find(self, key):
+        """Returns the index of the key, or -1 if it is not in the table."""
+        i = self.bisect_left(key)
+        if i < self.__count and self.key(i) == key:
+            return i
+        return -1
@@ -3,14 +3,17 @@
 
 from abc import ABC
 from abc import abstractmethod
+from array import array
+import atexit
+from collections import OrderedDict
 from enum import Enum, auto
 import logging
 import os
+import re
+import struct
+import threading
 
-import jieba
-import jieba.posseg as pseg
-import pynlpir
-
+from chinese.store import Table, cache_directory, pack_table
 import chinese.errors as errors
 
 logging.getLogger("jieba").setLevel(logging.WARNING)
@@ -19,38 +22,462 @@ logging.getLogger("jieba").setLevel(logging.WARNING)
 class Engine(Enum):
     jieba = auto()
     pynlpir = auto()
+    cedict = auto()
+
+class PynlpirSession:
+    """Manages the NLPIR session of the current process.
+
+    NLPIR is initialized once and reused by every tokenize call, and closed when
+    the interpreter exits. A session inherited through fork is not shared; the
+    child process opens its own session on first use.
+    """
+
+    def __init__(self):
+        self.__lock = threading.RLock()
+        self.__pid = None
+        self.__pynlpir = None
+        self.__registered = False
+
+    def reset_lock(self):
+        """Replaces the lock, which another thread of the parent may hold at fork."""
+        self.__lock = threading.RLock()
+
+    def open(self):
+        """Opens the session unless this process already has one, and returns pynlpir."""
+        with self.__lock:
+            if self.__pid == os.getpid():
+                return self.__pynlpir
+            import pynlpir
+            if self.__pid is not None:
+                # Free the state copied from the parent process before reinitializing.
+                pynlpir.close()
+            pynlpir.open()
+            self.__pynlpir = pynlpir
+            self.__pid = os.getpid()
+            if not self.__registered:
+                atexit.register(self.close)
+                self.__registered = True
+            return pynlpir
+
+    def close(self):
+        """Closes the session if this process has opened one."""
+        with self.__lock:
+            if self.__pid == os.getpid():
+                self.__pynlpir.close()
+            self.__pid = None
+
+    def segment(self, strings):
+        """Segments each string within one acquisition of the session."""
+        with self.__lock:
+            pynlpir = self.open()
+            return [pynlpir.segment(string) if string else [] for string in strings]
+
+# NLPIR keeps global state, so there is only one session per process.
+pynlpir_session = PynlpirSession()
+
+def _reset_pynlpir_session():
+    pynlpir_session.reset_lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_pynlpir_session)
+
+class JiebaTokenizers:
+    """The jieba tokenizers of the current process, shared by every Tokenizer.
+
+    A jieba.Tokenizer holds its prefix dictionary of about 100 MB, so one is built
+    for each dictionary and user dictionaries, and reused afterwards.
+    """
+
+    def __init__(self):
+        self.__tokenizers = {}
+        self.__lock = threading.Lock()
+
+    def get(self, dict_path, userdict, cache_dir=None):
+        """Returns an initialized jieba.Tokenizer.
+
+        Args:
+            dict_path (str): A path to jieba's main dictionary, or None for its default.
+            userdict (tuple): Paths to jieba user dictionaries.
+            cache_dir (str): A directory where the prefix dictionary is cached when
+                the tokenizer is built.
+        """
+        key = (dict_path, userdict)
+        tokenizer = self.__tokenizers.get(key)
+        if tokenizer is None:
+            with self.__lock:
+                tokenizer = self.__tokenizers.get(key)
+                if tokenizer is None:
+                    tokenizer = self.__tokenizers[key] = self.__build(dict_path, userdict, cache_dir)
+        return tokenizer
+
+    @staticmethod
+    def __build(dict_path, userdict, cache_dir):
+        import jieba
+        tokenizer = jieba.Tokenizer(dict_path)
+        tokenizer.tmp_dir = cache_dir or cache_directory('jieba')
+        tokenizer.initialize()
+        for path in userdict:
+            tokenizer.load_userdict(path)
+        return tokenizer
+
+jieba_tokenizers = JiebaTokenizers()
+
+class WordTable:
+    """A vocabulary stored in a compiled table, matched by bisection.
+
+    The words are sorted in code point order, with the range of words starting
+    with each character, so a match bisects only the words sharing its first
+    character. A table of reversed words matches words ending at a position.
+    """
+
+    def __init__(self, buffer, *, reverse=False):
+        """
+        Args:
+            buffer: A buffer returned by build().
+            reverse (bool): Whether the words were reversed by build().
+        """
+        buffer = memoryview(buffer)
+        count = struct.unpack_from('<I', buffer, 0)[0]
+        codes = buffer[8:8 + count * 4].cast('I')
+        starts = buffer[8 + count * 4:8 + (count * 2 + 1) * 4].cast('I')
+        self.__ranges = {chr(code): (starts[i], starts[i + 1]) for i, code in enumerate(codes)}
+        self.__table = Table(buffer[self.__header_size(count):])
+        self.__reverse = reverse
+
+    @staticmethod
+    def __header_size(count):
+        return (8 + (count * 2 + 1) * 4 + 7) // 8 * 8
+
+    @classmethod
+    def build(cls, words, *, reverse=False):
+        """Returns the buffer of a WordTable of the words, reversed if reverse is set."""
+        words = sorted({word[::-1] if reverse else word for word in words if word})
+        codes, starts = array('I'), array('I')
+        for i, word in enumerate(words):
+            if not codes or codes[-1] != ord(word[0]):
+                codes.append(ord(word[0]))
+                starts.append(i)
+        starts.append(len(words))
+        header = struct.pack('<I4x', len(codes)) + codes.tobytes() + starts.tobytes()
+        header += bytes(cls.__header_size(len(codes)) - len(header))
+        return header + pack_table((word.encode('utf-8'), b'') for word in words)
+
+    def match(self, string, start, end):
+        """Returns the length of the longest word in string[start:end] starting at start,
+        or ending at end if the words are reversed, and 0 if there is none."""
+        reverse = self.__reverse
+        bounds = self.__ranges.get(string[end - 1] if reverse else string[start])
+        if bounds is None:
+            return 0
+        lo, hi = bounds
+        table = self.__table
+        longest = 0
+        for length in range(1, end - start + 1):
+            word = string[end - length:end][::-1] if reverse else string[start:start + length]
+            key = word.encode('utf-8')
+            # Words of one character come first in the range of their character.
+            if length > 1:
+                lo = table.bisect_left(key, lo, hi)
+                if lo == hi:
+                    break
+                found = table.key(lo)
+                if not found.startswith(key):
+                    break
+                # Narrow the range down to the words starting with key.
+                hi = table.bisect_left(key + b'\xff', lo, hi)
+            else:
+                found = table.key(lo)
+            if found == key:
+                longest = length
+        return longest
+
+class MaximumMatcher:
+    """Segments text by maximum matching against a vocabulary.
+
+    The vocabulary is held as prefix and suffix tables mapping every prefix (or
+    suffix) of a word to whether it is a word itself, so that a scan can stop
+    as soon as no longer word is possible. Runs of characters that start no word
+    and look like alphanumerics, e.g. 'Python' or 'C++', are kept as one token.
+
+    The tables are dicts built from the words. WordTables stored in a compiled
+    dictionary need no building but are slower to match, so a matcher given them
+    only uses them until it has matched about as much text as building the dicts
+    is worth, and then builds the dicts.
+    """
+
+    alphanumeric = re.compile(r'[a-zA-Z0-9+#&._%\-]+')
+
+    # The number of characters matched with WordTables before the dicts are built.
+    switch_after = 100000
+
+    def __init__(self, words=None, *, tables=None):
+        """
+        Args:
+            words: An iterable of words.
+            tables: A (prefixes, suffixes) pair of WordTables of the words, used
+                until switch_after characters are matched if words are given,
+                and always otherwise. Dicts as built by warmup() are also
+                accepted.
+        """
+        self.__words = words
+        self.__matched = 0
+        self.__lock = threading.Lock()
+        if tables is not None:
+            self.__prefixes, self.__suffixes = tables
+        else:
+            self.__words = () if words is None else words
+            self.warmup()
+
+    def warmup(self):
+        """Builds the dicts from the words unless they are built."""
+        with self.__lock:
+            if self.__words is None:
+                return
+            prefixes, suffixes = {}, {}
+            for word in self.__words:
+                for i in range(1, len(word)):
+                    prefixes.setdefault(word[:i], False)
+                    suffixes.setdefault(word[-i:], False)
+                prefixes[word] = True
+                suffixes[word] = True
+            self.__prefixes, self.__suffixes = prefixes, suffixes
+            self.__words = None
+
+    def edit(self, added, removed):
+        """Returns a copy of the matcher with words added to and removed from its vocabulary.
+
+        The copy matches with the dicts, which are built first if necessary.
+        """
+        self.warmup()
+        prefixes, suffixes = dict(self.__prefixes), dict(self.__suffixes)
+        for word in removed:
+            if word in prefixes:
+                prefixes[word] = False
+                suffixes[word] = False
+        for word in added:
+            for i in range(1, len(word)):
+                prefixes.setdefault(word[:i], False)
+                suffixes.setdefault(word[-i:], False)
+            prefixes[word] = True
+            suffixes[word] = True
+        return MaximumMatcher(tables=(prefixes, suffixes))
+
+    def __count(self, string):
+        if self.__words is not None:
+            self.__matched += len(string)
+            if self.__matched > self.switch_after:
+                self.warmup()
+
+    def forward(self, string):
+        """Returns (token, start, end) tuples found by forward maximum matching."""
+        self.__count(string)
+        tokens = []
+        i, n = 0, len(string)
+        while i < n:
+            end = self.__word_end(string, i)
+            if end == i + 1:
+                match = self.alphanumeric.match(string, i)
+                if match:
+                    end = match.end()
+            tokens.append((string[i:end], i, end))
+            i = end
+        return tokens
+
+    def backward(self, string):
+        """Returns (token, start, end) tuples found by backward maximum matching."""
+        self.__count(string)
+        tokens = []
+        j = len(string)
+        while j > 0:
+            start = self.__word_start(string, j)
+            if start == j - 1 and self.alphanumeric.match(string, start):
+                while start > 0 and self.alphanumeric.match(string[start - 1]):
+                    start -= 1
+            tokens.append((string[start:j], start, j))
+            j = start
+        tokens.reverse()
+        return tokens
+
+    def __word_end(self, string, i):
+        """Returns the end of the longest word starting at i, or i + 1."""
+        prefixes = self.__prefixes
+        if isinstance(prefixes, WordTable):
+            return i + max(prefixes.match(string, i, len(string)), 1)
+        end = i + 1
+        for j in range(i + 1, len(string) + 1):
+            is_word = prefixes.get(string[i:j])
+            if is_word is None:
+                break
+            if is_word:
+                end = j
+        return end
+
+    def __word_start(self, string, j):
+        """Returns the start of the longest word ending at j, or j - 1."""
+        suffixes = self.__suffixes
+        if isinstance(suffixes, WordTable):
+            return j - max(suffixes.match(string, 0, j), 1)
+        start = j - 1
+        for i in range(j - 1, -1, -1):
+            is_word = suffixes.get(string[i:j])
+            if is_word is None:
+                break
+            if is_word:
+                start = i
+        return start
+
+    def bidirectional(self, string):
+        """Returns the better of the forward and backward segmentations.
+
+        Fewer tokens win, then fewer single-character tokens. Ties go to the
+        backward segmentation, which is more often right for Chinese.
+        """
+        forward, backward = self.forward(string), self.backward(string)
+        def cost(tokens):
+            return len(tokens), sum(1 for token in tokens if len(token[0]) == 1)
+        return forward if cost(forward) < cost(backward) else backward
 
 class Tokenizer:
     
     jieba = Engine.jieba
     pynlpir = Engine.pynlpir
+    cedict = Engine.cedict
+
+    # The number of dictionaries whose MaximumMatchers are kept.
+    max_matchers = 8
     
-    def __init__(self):
+    def __init__(self, *, cache_dir=None, dictionary=None):
+        """
+        Args:
+            cache_dir (str): A directory where jieba's prefix dictionaries are cached.
+                Defaults to a `jieba` directory under chinese's cache directory.
+            dictionary: A Dictionary object whose headwords are used by the cedict
+                engine. Defaults to the default dictionary.
+        """
         self.tokenizer = Engine.jieba
+        self.cache_dir = cache_dir
+        self.dictionary = dictionary
+        self.__matchers = OrderedDict()
+        self.__lock = threading.Lock()
     
-    def tokenize(self, string, *, traditional=False, using=Engine.jieba):
-        """Returns a list of tokens"""
+    def tokenize(self, string, *, traditional=False, using=Engine.jieba, userdict=None, dictionary=None):
+        """Returns a list of tokens
+
+        Args:
+            userdict: A path or a sequence of paths to jieba user dictionaries,
+                used only with the jieba engine.
+            dictionary: A Dictionary object used instead of the tokenizer's own by
+                the cedict engine.
+        """
         if using == Engine.jieba:
-            return self.__jieba_tokenize(string, traditional)
+            return list(self.jieba_tokenizer(traditional=traditional, userdict=userdict).tokenize(string))
         elif using == Engine.pynlpir:
-            pynlpir.open()
             return self.__pynlpir_tokenize(string)
+        elif using == Engine.cedict:
+            return self.maximum_matcher(traditional=traditional, dictionary=dictionary).bidirectional(string)
         elif isinstance(using, TokenizerInterface):
             return using.tokenize(string)
         else:
             raise errors.InvalidEngineError('InvalidEngineError: {}'.format(using))
 
-    def __jieba_tokenize(self, string, traditional):
+    def tokenize_many(self, strings, *, traditional=False, using=Engine.jieba, userdict=None):
+        """Returns a list of lists of tokens, one for each string.
+
+        With pynlpir, all strings are segmented within one acquisition of the session.
+        """
+        if using == Engine.pynlpir:
+            return pynlpir_session.segment(strings)
+        return [self.tokenize(string, traditional=traditional, using=using, userdict=userdict)
+                for string in strings]
+
+    def warmup(self, *, traditional=False, using=Engine.jieba):
+        """Imports and initializes the engine so that the first tokenize call is not slow."""
+        if using == Engine.jieba:
+            self.jieba_tokenizer(traditional=traditional)
+        elif using == Engine.pynlpir:
+            pynlpir_session.open()
+        elif using == Engine.cedict:
+            self.maximum_matcher(traditional=traditional)
+        elif not isinstance(using, TokenizerInterface):
+            raise errors.InvalidEngineError('InvalidEngineError: {}'.format(using))
+
+    def jieba_tokenizer(self, *, traditional=False, userdict=None):
+        """Returns an initialized jieba.Tokenizer for the dictionaries.
+
+        A tokenizer is built on first use for each combination of dictionaries and
+        shared by every Tokenizer of the process afterwards, so jieba's global
+        dictionary is never switched. See JiebaTokenizers.
+        """
+        if userdict is None:
+            userdict = ()
+        elif isinstance(userdict, str):
+            userdict = (userdict,)
+        dict_path = None
         if traditional:
             directory = os.path.abspath(os.path.dirname(__file__))
             dict_path = os.path.join(directory, 'data', 'dict.txt.big')
-            jieba.set_dictionary(dict_path)
-        return list(jieba.tokenize(string))
-    
+        return jieba_tokenizers.get(dict_path, tuple(userdict), self.cache_dir)
+
+    def maximum_matcher(self, *, traditional=False, dictionary=None):
+        """Returns a MaximumMatcher over the headwords of the dictionary.
+
+        Compiled dictionaries store tables their matchers start with, so that
+        short texts need no building; see MaximumMatcher. Other matchers are
+        built on first use, and rebuilt after the dictionary is reloaded. Edits
+        of the dictionary are applied to its matcher. The matchers of the most
+        recently used dictionaries are kept.
+
+        Args:
+            dictionary: A Dictionary object. Defaults to the tokenizer's own.
+        """
+        if dictionary is None:
+            if self.dictionary is None:
+                from chinese.dictionary import Dictionary
+                self.dictionary = Dictionary()
+            dictionary = self.dictionary
+        dictionary.warmup()
+        headwords = dictionary.traditional if traditional else dictionary.simplified
+
+        # Keyed by the dictionary object, which the entry keeps alive.
+        key = (traditional, id(dictionary))
+        with self.__lock:
+            cached = self.__matchers.get(key)
+            if cached is not None and cached[1] is headwords:
+                self.__matchers.move_to_end(key)
+                return cached[2]
+
+        # Built without the lock, so tokenizing with other dictionaries goes on meanwhile.
+        # An edit of the dictionary is applied to its matcher rather than rebuilding it.
+        changed = None
+        if cached is not None and cached[0] is dictionary:
+            from chinese.dictionary import EditedIndex
+            changed = EditedIndex.changed_keys(cached[1], headwords)
+        if changed is not None:
+            changed = [key for key in changed if key != 'name']
+            matcher = cached[2].edit((key for key in changed if key in headwords),
+                                     (key for key in changed if key not in headwords))
+        else:
+            tables = dictionary.word_tables(traditional=traditional)
+            matcher = MaximumMatcher(dictionary.headwords(traditional=traditional), tables=tables)
+        with self.__lock:
+            self.__matchers[key] = (dictionary, headwords, matcher)
+            while len(self.__matchers) > self.max_matchers:
+                self.__matchers.popitem(last=False)
+        return matcher
+
+    def prepare(self, dictionary):
+        """Builds the MaximumMatchers of a dictionary which the tokenizer's own has.
+
+        This lets a dictionary replacing the tokenizer's own be used without
+        waiting for its matchers to be built.
+        """
+        with self.__lock:
+            scripts = [traditional for traditional, key in self.__matchers if key == id(self.dictionary)]
+        for traditional in scripts:
+            self.maximum_matcher(traditional=traditional, dictionary=dictionary).warmup()
+
     def __pynlpir_tokenize(self, string):
-        if string == '':
-            return []
-        return pynlpir.segment(string)
+        return pynlpir_session.segment([string])[0]
 
 class TokenizerInterface(ABC):
 
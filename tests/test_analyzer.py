@@ -4,12 +4,37 @@
 import pytest
 
 from chinese import ChineseAnalyzer
+from chinese.api import ChineseAnalyzerResult
 from chinese.dictionary import Simplified
 from chinese.tokenizer import Tokenizer, TokenizerInterface
 import chinese.errors as errors
 
 analyzer = ChineseAnalyzer()
 
+class CharacterTokenizer(TokenizerInterface):
+    def tokenize(self, string):
+        return [(c, i, i + 1) for i, c in enumerate(string)]
+
+def test_import_is_lazy():
+    import subprocess
+    import sys
+    code = (
+        'import sys\n'
+        'from chinese import ChineseAnalyzer\n'
+        'analyzer = ChineseAnalyzer()\n'
+        'print(sorted(m for m in ("jieba", "pynlpir") if m in sys.modules))\n'
+        'print(analyzer.dictionary.simplified is None)\n'
+    )
+    output = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE,
+                            universal_newlines=True, check=True).stdout
+    assert output.split('\n')[:2] == ['[]', 'True']
+
+def test_warmup():
+    warm = ChineseAnalyzer()
+    warm.warmup()
+    assert warm.dictionary.simplified is not None
+    assert warm.parse('你好').tokens() == ['你好']
+
 @pytest.mark.parametrize('arg, expected',
                          [('你好', '你好'),
                           ('', ''),
@@ -43,6 +68,34 @@ def test_custom_tokenizer_works():
     expected = [('seems',), ('not',), ('working',)]
     assert result.tokens(details=True) == expected
 
+def test_custom_tokenizer_details_are_kept():
+    class TaggingTokenizer(TokenizerInterface):
+        def tokenize(self, string):
+            return [(c, 'x') for c in string]
+    result = analyzer.parse('你好你', using=TaggingTokenizer())
+    assert result.tokens(details=True) == [('你', 'x'), ('好', 'x'), ('你', 'x')]
+    assert result.tokens() == ['你', '好', '你']
+
+def test_custom_tokenizer_three_tuple_details_are_kept():
+    class TaggingTokenizer(TokenizerInterface):
+        def tokenize(self, string):
+            return [(c, 'n', 'noun') for c in string]
+    result = analyzer.parse('你好', using=TaggingTokenizer())
+    assert result.tokens(details=True) == [('你', 'n', 'noun'), ('好', 'n', 'noun')]
+    assert result.tokens() == ['你', '好']
+
+def test_tokens_are_looked_up_once(monkeypatch):
+    looked_up = []
+    lookup = analyzer.dictionary.lookup_with_simplified_chinese
+    def counting_lookup(string):
+        looked_up.append(string)
+        return lookup(string)
+    monkeypatch.setattr(analyzer.dictionary, 'lookup_with_simplified_chinese', counting_lookup)
+    result = analyzer.parse('你好你', using=CharacterTokenizer())
+    assert looked_up == ['你', '好']
+    assert result.tokens(details=True) == [('你', 0, 1), ('好', 1, 2), ('你', 2, 3)]
+    assert result.pinyin() == 'nǐ hǎo nǐ'
+
 def test_invalid_custom_tokenizer_raises():
     class InvalidTokenizer():
         def do_something_awsome(self, x):
@@ -70,6 +123,16 @@ def test_tokens_unique(arg, expected):
     result = analyzer.parse(arg)
     assert result.tokens(unique=True) == expected
 
+@pytest.mark.parametrize('arg, token, expected',
+                         [('的的的的的在的的的的就以和和和', '的', [0, 1, 2, 3, 4, 6, 7, 8, 9]),
+                          ('的的的的的在的的的的就以和和和', '在', [5]),
+                          ('的的的的的在的的的的就以和和和', '你', []),
+                         ])
+def test_positions(arg, token, expected):
+    result = analyzer.parse(arg)
+    assert result.positions(token) == expected
+    assert [result.tokens()[i] for i in expected] == [token] * len(expected)
+
 def test_freq():
     from collections import Counter
     result = analyzer.parse('这是一个伸手不见五指的黑夜。我叫孙悟空，我爱北京，我爱Python和C++。')
@@ -103,6 +166,18 @@ def test_search(arg, expected):
     result = analyzer.parse(text_for_search)
     assert result.search(arg) == expected
 
+def test_search_with_offsets():
+    result = analyzer.parse(' 您好。请问小美在家吗？\n\n在。请稍等。')
+    assert result.paragraphs(offsets=True) == [('您好。请问小美在家吗？', 1, 12), ('在。请稍等。', 14, 20)]
+    assert result.sentences(offsets=True)[:2] == [('您好', 1, 3), ('请问小美在家吗', 4, 11)]
+    assert result.search('在', offsets=True) == [('请问小美在家吗', 4, 11), ('在', 14, 15)]
+
+def test_search_tokens():
+    result = analyzer.parse(text_for_search)
+    assert result.search('计算机', token=True) == ['它研究能实现人与计算机之间用自然语言进行有效通信的各种理论和方法']
+    assert len(result.search('计算机')) == 5
+    assert result.search('小笼包', token=True) == []
+
 @pytest.mark.parametrize('arg, expected, traditional, force, all_readings',
                          [('你叫什么名字？', 'nǐ jiào shénme míngzi?', False, False, False),
                           ('我喜歡這個味道', 'wǒ xǐhuan zhège wèidao', True, False, False),
@@ -167,6 +242,54 @@ def test_pformat2():
     expected = '''{'original': '', 'parsed': []}'''
     assert result.pformat() == expected
 
+@pytest.mark.parametrize('serialize, deserialize',
+                         [(ChineseAnalyzerResult.to_dict, ChineseAnalyzerResult.from_dict),
+                          (ChineseAnalyzerResult.to_json, ChineseAnalyzerResult.from_json),
+                          (ChineseAnalyzerResult.to_bytes, ChineseAnalyzerResult.from_bytes),
+                         ])
+@pytest.mark.parametrize('arg, traditional, using',
+                         [('你叫什么名字？\n我叫小美。', False, Tokenizer.jieba),
+                          ('我喜歡這個味道', True, Tokenizer.jieba),
+                          ('你好你', False, CharacterTokenizer()),
+                          ('', False, Tokenizer.jieba),
+                         ])
+def test_serialization_round_trip(serialize, deserialize, arg, traditional, using):
+    result = analyzer.parse(arg, traditional=traditional, using=using)
+    restored = deserialize(analyzer, serialize(result))
+    assert restored.pformat() == result.pformat()
+    assert restored.tokens(details=True) == result.tokens(details=True)
+    assert restored.pinyin() == result.pinyin()
+    assert restored.freq() == result.freq()
+
+def test_serialization_keeps_stream_offsets():
+    result = list(analyzer.parse_stream(['你好\n我叫小美。']))[1]
+    restored = ChineseAnalyzerResult.from_bytes(analyzer, result.to_bytes())
+    assert restored.offset == 3
+    assert restored.tokens(details=True) == result.tokens(details=True) == [('我', 3, 4), ('叫', 4, 5), ('小美', 5, 7), ('。', 7, 8)]
+
+@pytest.mark.parametrize('deserialize, arg',
+                         [(ChineseAnalyzerResult.from_bytes, b'CNPR'),
+                          (ChineseAnalyzerResult.from_bytes, b'\x00' * 40),
+                          (ChineseAnalyzerResult.from_json, '{"original": ""}'),
+                          (ChineseAnalyzerResult.from_json, '{'),
+                         ])
+def test_deserialization_raises(deserialize, arg):
+    with pytest.raises(errors.InvalidResultError):
+        deserialize(analyzer, arg)
+
+@pytest.mark.parametrize('meta', [b'{}', b'[]', b'"vocabulary"', b'{"vocabulary": 1, "lookups": []}'])
+def test_from_bytes_with_invalid_metadata_raises(meta):
+    import struct
+    data = struct.pack('<4sBB2xQqIII', b'CNPR', 1, 0, 0, 0, 0, 0, len(meta)) + struct.pack('<I', 0) + meta
+    with pytest.raises(errors.InvalidResultError):
+        ChineseAnalyzerResult.from_bytes(analyzer, data)
+
+def test_from_dict_with_inconsistent_text_raises():
+    data = analyzer.parse('你好').to_dict()
+    data['original'] = '你好吗'
+    with pytest.raises(errors.InvalidResultError):
+        ChineseAnalyzerResult.from_dict(analyzer, data)
+
 @pytest.mark.parametrize('arg, expected',
                          [('永和服装饰品有限公司', 4),
                           ('', 0),
@@ -365,4 +488,125 @@ def test_str2():
 def test_str3():
     result = analyzer.parse('')
     expected = '{}'
-    assert str(result) == expected
\ No newline at end of file
+    assert str(result) == expected
+
+texts_for_parse_many = ['永和服装饰品有限公司', '', '我来到北京清华大学', '你叫什么名字？'] * 8
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_parse_many(workers):
+    results = list(analyzer.parse_many(texts_for_parse_many, workers=workers, chunksize=3))
+    expected = [analyzer.parse(text) for text in texts_for_parse_many]
+    assert [r.pformat() for r in results] == [e.pformat() for e in expected]
+    assert results[-1].pinyin() == expected[-1].pinyin()
+
+def test_parse_many_unordered():
+    results = analyzer.parse_many(texts_for_parse_many, workers=2, chunksize=1, ordered=False)
+    indexed = sorted((index, result.original()) for index, result in results)
+    assert indexed == list(enumerate(texts_for_parse_many))
+
+def test_parse_many_custom_tokenizer():
+    results = analyzer.parse_many(['你好', '中国'], workers=2, using=CharacterTokenizer())
+    assert [result.tokens() for result in results] == [['你', '好'], ['中', '国']]
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_parse_many_with_edited_dictionary(workers):
+    analyzer = ChineseAnalyzer()
+    analyzer.dictionary.add_entry('新詞語', '新词语', ['xin1', 'ci2', 'yu3'], ['neologism'])
+    results = analyzer.parse_many(['北京新词语'], workers=workers, using=Tokenizer.cedict)
+    assert [result.tokens() for result in results] == [['北京', '新词语']]
+
+text_for_stream = '您好。请问小美在家吗？\n\n在。请稍等。\n永和服装饰品有限公司\n'
+
+@pytest.mark.parametrize('chunks', [
+    [text_for_stream],
+    list(text_for_stream),
+    [text_for_stream[:7], text_for_stream[7:20], text_for_stream[20:]],
+])
+def test_parse_stream(chunks):
+    results = list(analyzer.parse_stream(chunks))
+    assert [result.original() for result in results] == ['您好。请问小美在家吗？', '在。请稍等。', '永和服装饰品有限公司']
+    assert [result.offset for result in results] == [0, 13, 20]
+    for result in results:
+        for word, start, end in result.tokens(details=True):
+            assert text_for_stream[start:end] == word
+
+def test_parse_stream_file():
+    import io
+    results = analyzer.parse_stream(io.StringIO(text_for_stream), max_length=4)
+    assert ''.join(result.original() for result in results) == text_for_stream.replace('\n', '')
+
+def test_split_stream_cuts_complete_paragraphs():
+    from chinese.api import _split_stream
+    text = '一二三四五六七八九十。一二三四五六七八九十\n短'
+    pieces = list(_split_stream([text], 8))
+    assert all(len(paragraph) <= 8 for _, paragraph in pieces)
+    assert [text[offset:offset + len(paragraph)] for offset, paragraph in pieces] == [p for _, p in pieces]
+    assert ''.join(p for _, p in pieces) == text.replace('\n', '')
+
+def test_parse_stream_splits_long_paragraphs():
+    results = list(analyzer.parse_stream([text_for_search], max_length=50))
+    assert ''.join(result.original() for result in results) == text_for_search
+    assert all(len(result.original()) <= 50 for result in results)
+    assert results[0].original().endswith('。')
+
+def test_parse_with_user_dictionary(tmp_path):
+    source = tmp_path / 'user.u8'
+    source.write_text('新詞語 新词语 [xin1 ci2 yu3] /neologism/\n', encoding='utf-8')
+    analyzer = ChineseAnalyzer()
+    analyzer.dictionaries.register('user', str(source))
+    result = analyzer.parse('北京新词语', using=Tokenizer.cedict, dictionary='user')
+    assert result.tokens() == ['北京', '新词语']
+    assert result['新词语'][0].definitions == ['neologism']
+    assert result.pinyin(force=True) == 'Běijīng xīncíyǔ'
+    assert analyzer.parse('新词语', using=Tokenizer.cedict).tokens() != ['新词语']
+
+def test_parse_with_user_dictionary_path_without_english_definitions(tmp_path):
+    source = tmp_path / 'user.u8'
+    source.write_text('新詞語 新词语 [xin1 ci2 yu3] /新的词/\n', encoding='utf-8')
+    result = ChineseAnalyzer().parse('北京新词语', using=Tokenizer.cedict, dictionary=str(source))
+    assert result.tokens() == ['北京', '新词语']
+
+def test_reload(tmp_path):
+    source = tmp_path / 'cedict_ts.u8'
+    source.write_text('新詞語 新词语 [xin1 ci2 yu3] /neologism/\n', encoding='utf-8')
+    analyzer = ChineseAnalyzer()
+    before = analyzer.parse('北京新词语', using=Tokenizer.cedict)
+    pinyin = before.pinyin(force=True)
+    old = analyzer.dictionary
+    future = analyzer.reload(str(source), wait=False)
+    dictionary = future.result()
+    assert analyzer.dictionary is dictionary is not old
+    after = analyzer.parse('北京新词语', using=Tokenizer.cedict)
+    assert after['新词语'][0].definitions == ['neologism']
+    assert before.pinyin(force=True) == pinyin
+    assert analyzer.reload() is analyzer.dictionary
+    assert analyzer.parse('北京', using=Tokenizer.cedict).tokens() == ['北京']
+
+def test_reload_parses_over_a_pool(tmp_path, monkeypatch, caplog):
+    import os
+    from chinese.dictionary import Dictionary
+    source = tmp_path / 'cedict_ts.u8'
+    source.write_text('新詞語 新词语 [xin1 ci2 yu3] /neologism/\n北京 北京 [Bei3 jing1] /Beijing/\n', encoding='utf-8')
+    # Inherited by the forked compiling process, which parses each line in a pool worker.
+    monkeypatch.setattr(Dictionary, 'chunksize', 1)
+    monkeypatch.setattr(os, 'cpu_count', lambda: 2)
+    analyzer = ChineseAnalyzer()
+    dictionary = analyzer.reload(str(source))
+    assert 'Could not compile' not in caplog.text
+    assert dictionary.lookup_with_simplified_chinese('新词语')[0].definitions == ['neologism']
+    assert len(list(tmp_path.glob('.cedict_ts.u8.*.bin'))) == 1
+
+def test_reload_while_parsing():
+    from concurrent.futures import ThreadPoolExecutor
+    analyzer = ChineseAnalyzer()
+    expected = analyzer.parse('我来到北京清华大学', using=Tokenizer.cedict).pformat()
+    with ThreadPoolExecutor(4) as executor:
+        parsed = [executor.submit(analyzer.parse, '我来到北京清华大学', using=Tokenizer.cedict)
+                  for _ in range(200)]
+        analyzer.reload()
+        assert all(future.result().pformat() == expected for future in parsed)
+
+def test_convert():
+    assert analyzer.convert('头发很长', to='traditional') == '頭髮很長'
+    assert ''.join(analyzer.convert_stream(['頭髮', '很長\n'])) == '头发很长\n'
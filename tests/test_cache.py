@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import pytest
+
+from chinese import ChineseAnalyzer
+from chinese.cache import ResultCache
+from chinese.tokenizer import Tokenizer
+
+def test_lru_eviction_by_entries():
+    cache = ResultCache(max_entries=2)
+    cache.put('a', b'1')
+    cache.put('b', b'2')
+    assert cache.get('a') == b'1'
+    cache.put('c', b'3')
+    assert cache.get('b') is None
+    assert cache.get('a') == b'1'
+    assert cache.get('c') == b'3'
+    assert cache.stats() == (3, 1, 0, 1, 2, 2)
+
+def test_lru_eviction_by_bytes():
+    cache = ResultCache(max_bytes=10)
+    cache.put('a', b'x' * 6)
+    cache.put('b', b'x' * 6)
+    assert len(cache) == 1
+    cache.put('c', b'x' * 11)
+    assert cache.get('c') is None
+    assert cache.stats().bytes == 6
+
+def test_disk_tier(tmp_path):
+    ResultCache(directory=str(tmp_path)).put('abcdef', b'value')
+    cache = ResultCache(directory=str(tmp_path))
+    assert cache.get('abcdef') == b'value'
+    assert cache.get('abcdef') == b'value'
+    assert cache.stats()[:3] == (1, 0, 1)
+
+def test_disk_tier_is_bounded(tmp_path):
+    cache = ResultCache(directory=str(tmp_path), max_disk_bytes=25)
+    for key in ('aa', 'bb', 'cc'):
+        cache.put(key, b'x' * 10)
+    assert len(list(tmp_path.glob('*/*.bin'))) == 2
+
+@pytest.fixture
+def analyzer(tmp_path):
+    return ChineseAnalyzer(cache=ResultCache(directory=str(tmp_path)))
+
+def test_parse_uses_cache(analyzer):
+    first = analyzer.parse('我爱北京天安门')
+    second = analyzer.parse('我爱北京天安门')
+    assert second.pformat() == first.pformat()
+    assert analyzer.cache.stats()[:2] == (1, 1)
+    analyzer.parse('我爱北京天安门', traditional=True)
+    analyzer.parse('我爱北京天安门', using=Tokenizer.cedict)
+    assert analyzer.cache.stats()[:2] == (1, 3)
+
+def test_cache_is_invalidated_by_dictionary(analyzer, tmp_path):
+    source = tmp_path / 'cedict_ts.u8'
+    source.write_text('天安門 天安门 [Tian1 an1 men2] /Tiananmen/\n', encoding='utf-8')
+    default = analyzer.parse('天安门', using=Tokenizer.cedict)
+    custom = analyzer.parse('天安门', using=Tokenizer.cedict, dictionary=str(source))
+    assert analyzer.cache.stats()[:2] == (0, 2)
+    assert custom['天安门'][0].definitions == ['Tiananmen']
+    assert custom.pformat() != default.pformat()
+
+def test_custom_tokenizers_are_not_cached(analyzer):
+    from chinese.tokenizer import TokenizerInterface
+    class CharacterTokenizer(TokenizerInterface):
+        def tokenize(self, string):
+            return [(c, i, i + 1) for i, c in enumerate(string)]
+    analyzer.parse('你好', using=CharacterTokenizer())
+    assert analyzer.cache.stats()[:2] == (0, 0)
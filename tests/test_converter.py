@@ -44,4 +44,34 @@ def test_uglify_raises_type_error():
     with pytest.raises(errors.InvalidArgumentTypeError) as excinfo:
         converter.uglify(arg)
     exception_msg = excinfo.value.args[0]
-    assert exception_msg == 'Argument must be a string: {}'.format(arg)
\ No newline at end of file
+    assert exception_msg == 'Argument must be a string: {}'.format(arg)
+
+@pytest.mark.parametrize('arg, expected',
+                         [(['zhong1', 'guo2', 'ren2'], ['zhōng', 'guó', 'rén']),
+                          (['Ri4', 'ben3', 'ma5'], ['Rì', 'běn', 'ma']),
+                          ('ni3 hao3, Zhong1guo2!', 'nǐ hǎo, Zhōngguó!'),
+                          ([], []),
+                         ])
+def test_prettify_many(arg, expected):
+    assert converter.prettify_many(arg) == expected
+
+@pytest.mark.parametrize('arg, expected',
+                         [(['zhōng', 'guó', 'rén'], ['zhong1', 'guo2', 'ren2']),
+                          (['Rì', 'běn', 'ma'], ['Ri4', 'ben3', 'ma5']),
+                          ('nǐ hǎo, zhōng guó!', 'ni3 hao3, zhong1 guo2!'),
+                          ([], []),
+                         ])
+def test_uglify_many(arg, expected):
+    assert converter.uglify_many(arg) == expected
+
+@pytest.mark.parametrize('syllable', Converter.syllables)
+def test_table_round_trip(syllable):
+    for tone in range(1, 6):
+        if tone < 5 and syllable in ('hm', 'hng', 'm', 'n', 'ng', 'r'):
+            continue
+        numbered = '{}{}'.format(syllable, tone)
+        assert converter.uglify(converter.prettify(numbered)) == numbered
+
+@pytest.mark.parametrize('arg', ['m2', 'ng2', 'hm1'])
+def test_prettify_without_vowel(arg):
+    assert converter.prettify(arg) == arg
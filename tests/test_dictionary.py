@@ -1,15 +1,224 @@
 #!/usr/bin/env python
 # coding: utf-8
 
+import os
+import pickle
+import random
+
 import pytest
 
-from chinese.dictionary import Dictionary, Traditional, Simplified
+from chinese.dictionary import Dictionary, DictionaryRegistry, Parser, ReadingTable, Traditional, Simplified
 import chinese.errors as errors
+from chinese.script import ScriptConverter
+from chinese.search import DefinitionIndex, PinyinIndex
+from chinese.store import Store
 
 dictionary = Dictionary()
 
 # Parser
 
+def test_parse_lines():
+    lines = ['# comment\n', '中國 中国 [Zhong1 guo2] /China/\n', '\n', '體 体 [ti3] /body/form/style/']
+    expected = [('中國', '中国', ['Zhong1', 'guo2'], ['China']),
+                ('體', '体', ['ti3'], ['body', 'form', 'style'])]
+    assert Parser.parse_lines(lines) == expected
+
+# Compiled dictionary
+
+cedict_sample = """\
+# A few lines in the CC-CEDICT format
+中國 中国 [Zhong1 guo2] /China/
+中國人 中国人 [Zhong1 guo2 ren2] /Chinese person/
+中國隊 中国队 [Zhong1 guo2 dui4] /Chinese team/
+馬 马 [Ma3] /surname Ma/abbr. for Malaysia 馬來西亞|马来西亚[Ma3 lai2 xi1 ya4]/
+馬 马 [ma3] /horse/CL:匹[pi3]/horse or cavalry piece in Chinese chess/knight in Western chess/
+體 体 [ti3] /body/form/style/
+"""
+
+@pytest.fixture
+def compiled_dictionary(tmp_path):
+    source = tmp_path / 'cedict_ts.u8'
+    source.write_text(cedict_sample, encoding='utf-8')
+    loaded = Dictionary()
+    loaded.load(str(source), cache=False)
+    loaded.compile(str(tmp_path / 'cedict.bin'))
+    compiled = Dictionary()
+    compiled.load(str(tmp_path / 'cedict.bin'))
+    return loaded, compiled
+
+@pytest.mark.parametrize('arg', ['中国', '中国人', '马', '体', '？', ''])
+def test_compiled_lookup_with_simplified_chinese(compiled_dictionary, arg):
+    loaded, compiled = compiled_dictionary
+    assert compiled.lookup_with_simplified_chinese(arg) == loaded.lookup_with_simplified_chinese(arg)
+
+@pytest.mark.parametrize('arg', ['中國', '馬', '體', '？', ''])
+def test_compiled_lookup_with_traditional_chinese(compiled_dictionary, arg):
+    loaded, compiled = compiled_dictionary
+    assert compiled.lookup_with_traditional_chinese(arg) == loaded.lookup_with_traditional_chinese(arg)
+
+def test_compiled_keys(compiled_dictionary):
+    _, compiled = compiled_dictionary
+    assert list(compiled.simplified) == ['中国', '中国人', '中国队', '体', '马']
+    assert len(compiled.traditional) == 5
+
+@pytest.mark.parametrize('arg, limit, expected',
+                         [('中', None, ['中国', '中国人', '中国队']),
+                          ('中国', 2, ['中国', '中国人']),
+                          ('体', None, ['体']),
+                          ('日', None, []),
+                         ])
+def test_lookup_prefix_with_simplified_chinese(compiled_dictionary, arg, limit, expected):
+    for d in compiled_dictionary:
+        assert d.lookup_prefix_with_simplified_chinese(arg, limit=limit) == expected
+
+@pytest.mark.parametrize('arg, expected',
+                         [('中國人民', '中國人'),
+                          ('中國隊員', '中國隊'),
+                          ('中國話', '中國'),
+                          ('馬上', '馬'),
+                          ('中', None),
+                          ('', None),
+                         ])
+def test_lookup_longest_prefix_with_traditional_chinese(compiled_dictionary, arg, expected):
+    for d in compiled_dictionary:
+        assert d.lookup_longest_prefix_with_traditional_chinese(arg) == expected
+
+@pytest.mark.parametrize('arg, expected',
+                         [('horse', ['马']),
+                          ('Chinese TEAM', ['中国队', '中国人', '马']),
+                          ('chess', ['马']),
+                          ('dragon', []),
+                         ])
+def test_search_definitions(compiled_dictionary, arg, expected):
+    for d in compiled_dictionary:
+        assert [headword for headword, _ in d.search_definitions(arg)] == expected
+
+def test_search_definitions_traditional(compiled_dictionary):
+    _, compiled = compiled_dictionary
+    result = compiled.search_definitions('China', limit=1, traditional=True)
+    assert result == [('中國', Traditional('中国', ['Zhong1', 'guo2'], ['China']))]
+
+@pytest.mark.parametrize('query', ['a', 'a b', 'a b c', 'b e', 'c d e f', 'f f a'])
+def test_definition_index_search_matches_exhaustive_scoring(query):
+    rng = random.Random(0)
+    words = 'aaaabbbcccdef'
+    entries = {'w{:04}'.format(i): [Simplified('', [], [' '.join(rng.choice(words) for _ in range(rng.randint(1, 8)))])]
+               for i in range(2000)}
+    index = DefinitionIndex(*DefinitionIndex.build(entries))
+    scores = {}
+    for term in set(query.split()):
+        for headword, ordinal, score in index.search(term, limit=len(entries)):
+            scores[headword, ordinal] = scores.get((headword, ordinal), 0.0) + score
+    expected = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    for limit in (1, 10, 100):
+        result = index.search(query, limit=limit)
+        assert [(headword, ordinal) for headword, ordinal, _ in result] == [doc for doc, _ in expected[:limit]]
+        assert [score for _, _, score in result] == pytest.approx([score for _, score in expected[:limit]])
+
+@pytest.mark.parametrize('arg, expected',
+                         [('zhong1 guo2', [('中国', ['Zhong1', 'guo2'])]),
+                          ('Zhōngguó', [('中国', ['Zhong1', 'guo2'])]),
+                          ('zhongguo', [('中国', ['Zhong1', 'guo2'])]),
+                          ('zhong1guo', [('中国', ['Zhong1', 'guo2'])]),
+                          ('zhong4 guo2', []),
+                          ('zhōng guòrén', []),
+                          ('zhonggu o', []),
+                          ('ma', [('马', ['Ma3']), ('马', ['ma3'])]),
+                          ('mǎ', [('马', ['Ma3']), ('马', ['ma3'])]),
+                          ('', []),
+                         ])
+def test_lookup_with_pinyin(compiled_dictionary, arg, expected):
+    for d in compiled_dictionary:
+        assert [(headword, result.pinyin) for headword, result in d.lookup_with_pinyin(arg)] == expected
+
+def test_lookup_with_pinyin_limit(compiled_dictionary):
+    _, compiled = compiled_dictionary
+    result = compiled.lookup_with_pinyin('ma3', limit=1, traditional=True)
+    assert result == [('馬', Traditional('马', ['Ma3'], ['surname Ma', 'abbr. for Malaysia 馬來西亞|马来西亚[Ma3 lai2 xi1 ya4]']))]
+
+def test_load_caches_compiled_dictionary(tmp_path):
+    source = tmp_path / 'cedict_ts.u8'
+    source.write_text(cedict_sample, encoding='utf-8')
+    Dictionary().load(str(source))
+    cached = list(tmp_path.glob('.cedict_ts.u8.*.bin'))
+    assert len(cached) == 1
+
+    source.write_text(cedict_sample + '愛 爱 [ai4] /to love/\n', encoding='utf-8')
+    updated = Dictionary()
+    updated.load(str(source))
+    assert updated.lookup_with_simplified_chinese('爱') == [Simplified('愛', ['ai4'], ['to love'])]
+    assert list(tmp_path.glob('.cedict_ts.u8.*.bin')) != cached
+    assert len(list(tmp_path.glob('.cedict_ts.u8.*.bin'))) == 1
+
+def test_load_appends_derived_indexes_to_cache_on_first_use(tmp_path, monkeypatch):
+    source = tmp_path / 'cedict_ts.u8'
+    source.write_text(cedict_sample, encoding='utf-8')
+    loaded = Dictionary()
+    loaded.load(str(source))
+    cached, = tmp_path.glob('.cedict_ts.u8.*.bin')
+    assert 'search.docs' not in Store(str(cached))
+    assert [headword for headword, _ in loaded.search_definitions('horse')] == ['马']
+    assert 'search.docs' in Store(str(cached))
+    assert 'pinyin' not in Store(str(cached))
+
+    monkeypatch.setattr(DefinitionIndex, 'build', pytest.fail)
+    reloaded = Dictionary()
+    reloaded.load(str(source))
+    assert [headword for headword, _ in reloaded.search_definitions('horse')] == ['马']
+    assert reloaded.lookup_with_pinyin('ma3')[0][0] == '马'
+    assert 'pinyin' in Store(str(cached))
+
+def test_load_keeps_caches_of_other_files(tmp_path):
+    for name in ('mydict', 'mydict.u8'):
+        (tmp_path / name).write_text(cedict_sample, encoding='utf-8')
+    Dictionary().load(str(tmp_path / 'mydict.u8'))
+    cached = list(tmp_path.glob('.mydict.u8.*.bin'))
+    Dictionary().load(str(tmp_path / 'mydict'))
+    assert list(tmp_path.glob('.mydict.u8.*.bin')) == cached
+    assert len(list(tmp_path.glob('.mydict.*.bin'))) == 2
+
+def test_load_dictionary_without_english_definitions(tmp_path):
+    source = tmp_path / 'user.u8'
+    source.write_text('新詞語 新词语 [xin1 ci2 yu3] /新的词/\n', encoding='utf-8')
+    loaded = Dictionary()
+    loaded.load(str(source))
+    assert loaded.lookup_with_simplified_chinese('新词语')[0].definitions == ['新的词']
+    assert loaded.search_definitions('word') == []
+
+def test_load_without_cache(tmp_path):
+    source = tmp_path / 'cedict_ts.u8'
+    source.write_text(cedict_sample, encoding='utf-8')
+    loaded = Dictionary()
+    loaded.load(str(source), cache=False, workers=2)
+    assert loaded.lookup_with_traditional_chinese('中國') == [Traditional('中国', ['Zhong1', 'guo2'], ['China'])]
+    assert list(tmp_path.glob('.*.bin')) == []
+
+def test_export_compiled_dictionary(compiled_dictionary, tmp_path):
+    loaded, compiled = compiled_dictionary
+    compiled.export(str(tmp_path / 'cedict.pickle'))
+    with open(str(tmp_path / 'cedict.pickle'), 'rb') as f:
+        data = pickle.load(f)
+    assert data['simplified']['name'] == 'simplified'
+    assert data['simplified']['中国'] == loaded.lookup_with_simplified_chinese('中国')
+    assert data['traditional']['體'] == loaded.lookup_with_traditional_chinese('體')
+    assert len(data['traditional']) == len(compiled.traditional) + 1
+
+def test_compiled_word_tables(compiled_dictionary):
+    loaded, compiled = compiled_dictionary
+    assert loaded.word_tables() is None
+    prefixes, suffixes = compiled.word_tables(traditional=True)
+    assert prefixes.match('中國人民', 0, 4) == 3
+    assert suffixes.match('我是中國人', 0, 5) == 3
+    compiled.add_entry('中國人民', '中国人民', ['Zhong1', 'guo2', 'ren2', 'min2'], ['Chinese people'])
+    assert compiled.word_tables(traditional=True) is None
+
+def test_load_broken_compiled_dictionary_raises(tmp_path):
+    from chinese.store import MAGIC
+    path = tmp_path / 'broken.bin'
+    path.write_bytes(MAGIC)
+    with pytest.raises(errors.InvalidDictionaryError):
+        Dictionary().load(str(path))
+
 
 # CEDICT
 
@@ -73,6 +282,29 @@ def test_lookup_pinyin_with_traditional_chinese_raises():
     exception_msg = excinfo.value.args[0]
     assert exception_msg == 'Argument must be a single character: {}'.format(arg)
 
+## lookup_character_pinyin
+
+@pytest.mark.parametrize('arg, expected',
+                         [('我们是日本人', 'wǒmenshìrìběnrén'),
+                          ('P我？', 'Pwǒ？'),
+                          ('𠀀', '𠀀'),
+                          ('', ''),
+                         ])
+def test_lookup_character_pinyin_with_simplified_chinese(arg, expected):
+    result = dictionary.lookup_character_pinyin_with_simplified_chinese(arg)
+    assert result == expected
+
+def test_lookup_character_pinyin_with_traditional_chinese():
+    result = dictionary.lookup_character_pinyin_with_traditional_chinese('繁體字')
+    assert result == ''.join(dictionary.lookup_pinyin_with_traditional_chinese(c) for c in '繁體字')
+
+def test_compiled_reading_table(compiled_dictionary):
+    loaded, compiled = compiled_dictionary
+    assert compiled.lookup_character_pinyin_with_simplified_chinese('中马体') == '中mǎtǐ'
+    assert loaded.lookup_character_pinyin_with_traditional_chinese('中馬體') == '中mǎtǐ'
+    compiled.remove_entry('馬', '马', ['Ma3'])
+    assert compiled.lookup_character_pinyin_with_simplified_chinese('马') == 'mǎ'
+
 ## lookup_meaning
 
 @pytest.mark.parametrize('arg, expected',
@@ -113,7 +345,222 @@ def test_lookup_meaning_with_traditional_chinese_raises():
                          [('好', True),
                           ('あ', False),
                           ('A', False),
+                          ('㐀', True),
+                          ('𠀀', True),
+                          ('䷀', False),
+                          ('', False),
                          ])
 def test_is_chinese_character(arg, expected):
     result = dictionary.is_chinese_character(arg)
     assert result == expected
+
+@pytest.mark.parametrize('arg, expected',
+                         [('中国', ('Zhōngguó', 'Zhong1 guo2', 'Zhongguo')),
+                          ('马', ('Mǎ', 'Ma3', 'Ma')),
+                          ('？', (None, None, None)),
+                         ])
+def test_rendered_pinyin(compiled_dictionary, arg, expected):
+    for d in compiled_dictionary:
+        result = d.lookup_with_simplified_chinese(arg)[0]
+        assert (result.pinyin_marks, result.pinyin_numbers, result.pinyin_toneless) == expected
+
+def test_pinyin_zhuyin(compiled_dictionary):
+    for d in compiled_dictionary:
+        result = d.lookup_with_traditional_chinese('中國')[0]
+        assert result.pinyin_zhuyin == 'ㄓㄨㄥ ㄍㄨㄛˊ'
+
+def test_pinyin_codes_are_shared(compiled_dictionary):
+    loaded, _ = compiled_dictionary
+    simplified = loaded.lookup_with_simplified_chinese('中国')[0]
+    traditional = loaded.lookup_with_traditional_chinese('中國')[0]
+    assert simplified.pinyin_codes is traditional.pinyin_codes
+
+def test_lookup_result_pickle():
+    result = Simplified('中國', ['Zhong1', 'guo2'], ['China'])
+    restored = pickle.loads(pickle.dumps(result))
+    assert restored == result
+    assert restored.pinyin == ['Zhong1', 'guo2']
+
+def test_lookup_result_has_no_dict():
+    result = Simplified('中國', ['Zhong1', 'guo2'], ['China'])
+    assert not hasattr(result, '__dict__')
+
+def test_lookup_miss_is_shared(compiled_dictionary):
+    for d in compiled_dictionary:
+        miss = d.lookup_with_simplified_chinese('？')
+        assert miss == [Simplified('？', None, None)]
+        assert miss[0] is d.lookup_with_simplified_chinese('？')[0]
+        assert miss[0] is not d.lookup_with_traditional_chinese('？')[0]
+
+# Overlays and registries
+
+def test_overlay_takes_precedence(tmp_path):
+    source = tmp_path / 'user.u8'
+    source.write_text('馬 马 [Ma3] /user horse/\n新詞語 新词语 [xin1 ci2 yu3] /neologism/\n', encoding='utf-8')
+    user = Dictionary()
+    user.load(str(source), cache=False)
+    layered = dictionary.overlay(user)
+    assert [r.definitions for r in layered.lookup_with_simplified_chinese('马')] == [['user horse']]
+    assert layered.lookup_with_simplified_chinese('新词语')[0].definitions == ['neologism']
+    assert layered.lookup_with_simplified_chinese('中国') == dictionary.lookup_with_simplified_chinese('中国')
+    assert layered.identity != dictionary.identity
+
+def test_registry(tmp_path):
+    first, second = tmp_path / 'first.u8', tmp_path / 'second.u8'
+    first.write_text('馬 马 [Ma3] /first/\n', encoding='utf-8')
+    second.write_text('馬 马 [Ma3] /second/\n體 体 [ti3] /second/\n', encoding='utf-8')
+    registry = DictionaryRegistry(dictionary)
+    registry.register('user', str(first), str(second))
+    assert 'user' in registry and registry.names() == ['user']
+    user = registry.get('user')
+    assert user is registry.get('user')
+    assert user.lookup_with_simplified_chinese('马')[0].definitions == ['first']
+    assert user.lookup_with_simplified_chinese('体')[0].definitions == ['second']
+
+    registry.check_interval = 0
+    first.write_text('馬 马 [Ma3] /edited/\n', encoding='utf-8')
+    os.utime(str(first), ns=(0, 0))
+    assert registry.get('user').lookup_with_simplified_chinese('马')[0].definitions == ['edited']
+
+    registry.unregister('user')
+    with pytest.raises(errors.InvalidKeyError):
+        registry.get('user')
+
+def test_registry_unloads_unregistered_files(tmp_path):
+    first, second = tmp_path / 'first.u8', tmp_path / 'second.u8'
+    first.write_text('馬 马 [Ma3] /first/\n', encoding='utf-8')
+    second.write_text('馬 马 [Ma3] /second/\n', encoding='utf-8')
+    files = DictionaryRegistry._DictionaryRegistry__files
+    registry, other = DictionaryRegistry(dictionary), DictionaryRegistry(dictionary)
+    registry.register('user', str(first))
+    other.register('user', str(first))
+    registry.get('user')
+    registry.register('user', str(second))
+    registry.get('user')
+    assert str(first) in files and str(second) in files
+    other.unregister('user')
+    assert str(first) not in files
+    registry.unregister('user')
+    assert str(second) not in files
+
+def test_registry_loads_files_concurrently(tmp_path, monkeypatch):
+    import threading
+    slow, fast = tmp_path / 'slow.u8', tmp_path / 'fast.u8'
+    for path in (slow, fast):
+        path.write_text('馬 马 [Ma3] /{}/\n'.format(path.stem), encoding='utf-8')
+    started, release = threading.Event(), threading.Event()
+    load = Dictionary.load
+    def blocking_load(self, path=None, **kwargs):
+        if path == str(slow):
+            started.set()
+            release.wait(10)
+        return load(self, path, **kwargs)
+    monkeypatch.setattr(Dictionary, 'load', blocking_load)
+    registry = DictionaryRegistry(dictionary)
+    registry.register('slow', str(slow))
+    registry.register('fast', str(fast))
+    thread = threading.Thread(target=registry.get, args=('slow',))
+    thread.start()
+    try:
+        assert started.wait(10)
+        assert registry.get('fast').lookup_with_simplified_chinese('马')[0].definitions == ['fast']
+        assert thread.is_alive()
+    finally:
+        release.set()
+        thread.join()
+    assert registry.get('slow').lookup_with_simplified_chinese('马')[0].definitions == ['slow']
+
+# Edits
+
+def test_add_and_remove_entry(compiled_dictionary):
+    for d in compiled_dictionary:
+        identity = d.identity
+        d.add_entry('新詞語', '新词语', ['xin1', 'ci2', 'yu3'], ['neologism'])
+        assert d.lookup_with_traditional_chinese('新詞語')[0].definitions == ['neologism']
+        assert d.lookup_prefix_with_simplified_chinese('新') == ['新词语']
+        assert d.remove_entry('馬', '马', ['ma3']) == 1
+        assert [r.pinyin for r in d.lookup_with_simplified_chinese('马')] == [['Ma3']]
+        assert d.remove_entry('中國', '中国') == 1
+        assert '中国' not in d.headwords()
+        assert d.lookup_longest_prefix_with_simplified_chinese('中国人民') == '中国人'
+        assert d.lookup_longest_prefix_with_simplified_chinese('中国') is None
+        assert d.identity != identity
+
+def test_edits_update_derived_indexes(compiled_dictionary, monkeypatch):
+    for d in compiled_dictionary:
+        assert [headword for headword, _ in d.search_definitions('horse')] == ['马']
+        assert [headword for headword, _ in d.lookup_with_pinyin('ti')] == ['体']
+        assert d.lookup_character_pinyin_with_traditional_chinese('體') == 'tǐ'
+        assert d.lookup_character_pinyin_with_simplified_chinese('体马') == 'tǐmǎ'
+        assert d.convert('馬體') == '马体'
+    # The indexes of the unedited entries are kept and the edits applied to them.
+    for cls in (DefinitionIndex, PinyinIndex, ReadingTable, ScriptConverter):
+        monkeypatch.setattr(cls, 'build', lambda *args: pytest.fail('rebuilt'))
+    for d in compiled_dictionary:
+        d.add_entry('中國人民', '中国人民', ['Zhong1', 'guo2', 'ren2', 'min2'], ['Chinese people'])
+        d.remove_entry('馬', '马', ['ma3'])
+        d.remove_entry('體', '体')
+        d.add_entry('體', '体', ['ti1'], ['body'])
+        d.add_entry('馬體', '马休', ['ma3', 'xiu1'], ['horse body'])
+        assert [headword for headword, _ in d.search_definitions('people')] == ['中国人民']
+        assert [headword for headword, _ in d.search_definitions('horse')] == ['马休']
+        assert [headword for headword, _ in d.lookup_with_pinyin('zhongguorenmin')] == ['中国人民']
+        assert [headword for headword, _ in d.lookup_with_pinyin('ti')] == ['体']
+        assert [r.pinyin for _, r in d.lookup_with_pinyin('ti')] == [['ti1']]
+        assert d.lookup_character_pinyin_with_traditional_chinese('體') == 'tī'
+        assert d.lookup_character_pinyin_with_simplified_chinese('体马') == 'tīmǎ'
+        assert d.convert('馬體馬') == '马休马'
+        d.remove_entry('馬體', '马休')
+        assert d.search_definitions('horse') == []
+        assert d.convert('馬體') == '马体'
+
+def test_apply_cedict_diff(tmp_path):
+    old, new = tmp_path / 'old.u8', tmp_path / 'new.u8'
+    old.write_text(cedict_sample, encoding='utf-8')
+    new.write_text(cedict_sample.replace('/surname Ma/', '/family name Ma/')
+                   .replace('體 体 [ti3] /body/form/style/\n', '體 体 [ti3] /body/\n'), encoding='utf-8')
+    d = Dictionary()
+    d.load(str(old), cache=False)
+    assert d.apply_cedict_diff(str(old), str(new)) == (2, 2)
+    assert [r.definitions[0] for r in d.lookup_with_simplified_chinese('马')] == ['family name Ma', 'horse']
+    assert d.lookup_with_simplified_chinese('体')[0].definitions == ['body']
+
+def test_edits_are_journaled(tmp_path):
+    source = tmp_path / 'cedict_ts.u8'
+    source.write_text(cedict_sample, encoding='utf-8')
+    compiled = str(tmp_path / 'cedict.bin')
+    d = Dictionary()
+    d.load(str(source), cache=False)
+    d.compile(compiled)
+    d.load(compiled)
+    d.add_entry('新詞語', '新词语', ['xin1', 'ci2', 'yu3'], ['neologism'])
+    d.remove_entry('體', '体')
+
+    reloaded = Dictionary()
+    reloaded.load(compiled)
+    assert reloaded.lookup_with_simplified_chinese('新词语')[0].definitions == ['neologism']
+    assert '体' not in reloaded.simplified
+    assert reloaded.identity == d.identity
+
+    d.compile(compiled)
+    assert not os.path.exists(compiled + Dictionary.journal_suffix)
+    assert d.lookup_with_simplified_chinese('新词语')[0].definitions == ['neologism']
+    reloaded.load(compiled)
+    assert reloaded.lookup_with_simplified_chinese('新词语')[0].definitions == ['neologism']
+    assert d.unjournaled_edits() == []
+
+def test_replay_unjournaled_edits(tmp_path):
+    source = tmp_path / 'cedict_ts.u8'
+    source.write_text(cedict_sample, encoding='utf-8')
+    d = Dictionary()
+    d.load(str(source))
+    d.add_entry('新詞語', '新词语', ['xin1', 'ci2', 'yu3'], ['neologism'])
+    d.remove_entry('體', '体')
+    assert d.unjournaled_edits() == [['+新詞語 新词语 [xin1 ci2 yu3] /neologism/'], ['-體 体']]
+
+    replayed = Dictionary()
+    replayed.load(str(source))
+    replayed.replay_edits(d.unjournaled_edits())
+    assert replayed.lookup_with_simplified_chinese('新词语')[0].definitions == ['neologism']
+    assert '体' not in replayed.simplified
+    assert replayed.unjournaled_edits() == []
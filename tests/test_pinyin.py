@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import pytest
+
+from chinese.pinyin import PinyinTable, to_zhuyin
+
+@pytest.mark.parametrize('syllable, tone, expected',
+                         [('zhong', 1, 'ㄓㄨㄥ'),
+                          ('Guo', 2, 'ㄍㄨㄛˊ'),
+                          ('shi', 4, 'ㄕˋ'),
+                          ('you', 3, 'ㄧㄡˇ'),
+                          ('yuan', 2, 'ㄩㄢˊ'),
+                          ('jue', 2, 'ㄐㄩㄝˊ'),
+                          ('lu:', 4, 'ㄌㄩˋ'),
+                          ('ma', 5, '˙ㄇㄚ'),
+                          ('r', 5, '˙ㄦ'),
+                          ('xx', 5, None),
+                         ])
+def test_to_zhuyin(syllable, tone, expected):
+    assert to_zhuyin(syllable, tone) == expected
+
+def test_pack():
+    table = PinyinTable()
+    codes = table.pack(['Zhong1', 'guo2', 'ren2', 'guo2'])
+    assert codes[1] == codes[3]
+    assert codes[1] & 7 == 2
+    assert table.numbers(codes) == ['Zhong1', 'guo2', 'ren2', 'guo2']
+    assert table.marks(codes) == 'Zhōngguórénguó'
+    assert table.toneless(codes, ' ') == 'Zhong guo ren guo'
+    assert table.zhuyin(codes[:2]) == 'ㄓㄨㄥ ㄍㄨㄛˊ'
+    assert table.pack(None) is None
+
+def test_pack_without_tone():
+    table = PinyinTable()
+    codes = table.pack(['A', 'xx5'])
+    assert codes[0] & 7 == 0
+    assert table.numbers(codes) == ['A', 'xx5']
+    assert table.zhuyin(codes) == 'A xx5'
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import io
+
+import pytest
+
+from chinese.dictionary import Dictionary
+from chinese.script import ScriptConverter
+import chinese.errors as errors
+
+dictionary = Dictionary()
+
+@pytest.mark.parametrize('arg, expected',
+                         [('头发很长', '頭髮很長'),
+                          ('发展经济', '發展經濟'),
+                          ('干净', '乾淨'),
+                          ('乾隆皇帝', '乾隆皇帝'),
+                          ('我只有一个问题', '我只有一個問題'),
+                          ('请联系我们', '請聯繫我們'),
+                          ('干部', '幹部'),
+                          ('Python 3', 'Python 3'),
+                          ('', ''),
+                         ])
+def test_convert_to_traditional(arg, expected):
+    assert dictionary.convert(arg, to='traditional') == expected
+
+@pytest.mark.parametrize('arg, expected',
+                         [('頭髮很長', '头发很长'),
+                          ('乾淨的乾隆皇帝', '干净的乾隆皇帝'),
+                         ])
+def test_convert_to_simplified(arg, expected):
+    assert dictionary.convert(arg, to='simplified') == expected
+
+def test_convert_raises():
+    with pytest.raises(errors.InvalidScriptError):
+        dictionary.convert('头发', to='pinyin')
+
+class Entry:
+    def __init__(self, match, definitions=()):
+        self.match = match
+        self.definitions = list(definitions)
+
+def test_phrases_take_priority():
+    # Simplified headwords and the Traditional matches of their entries.
+    sample = {'头': ['頭'], '发': ['髮', '發'], '发展': ['發展'], '发现': ['發現'], '发生': ['發生'], '头发': ['頭髮']}
+    converter = ScriptConverter(ScriptConverter.build(
+        {key: [Entry(match) for match in matches] for key, matches in sample.items()}))
+    assert converter.convert('发') == '發'
+    assert converter.convert('头发发现') == '頭髮發現'
+    assert converter.convert('发头发') == '發頭髮'
+
+def test_variants_are_skipped_and_votes_are_weighted():
+    sample = {'只': [Entry('只'), Entry('隻')], '一只': [Entry('一隻')], '只有': [Entry('只有')],
+              '联系': [Entry('聯係', ['variant of 聯繫|联系[lian2 xi4]']), Entry('聯繫', ['connection'])]}
+    converter = ScriptConverter(ScriptConverter.build(sample, {'只有': 5622, '一只': 1}))
+    assert converter.convert('只联系') == '只聯繫'
+    assert converter.convert('一只') == '一隻'
+
+def test_convert_stream():
+    converter = dictionary.script_converter(to='traditional')
+    text = '头发很长。\n我们发展经济，头发' * 50
+    expected = converter.convert(text)
+    assert ''.join(converter.convert_stream(io.StringIO(text), max_length=7)) == expected
+    assert ''.join(converter.convert_stream(list(text))) == expected
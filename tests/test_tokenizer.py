@@ -1,9 +1,16 @@
 #!/usr/bin/env python
 # coding: utf-8
 
+import os
+import sys
+import threading
+import time
+import types
+
 import pytest
 
-from chinese.tokenizer import Tokenizer, TokenizerInterface
+from chinese.dictionary import Dictionary
+from chinese.tokenizer import MaximumMatcher, PynlpirSession, Tokenizer, TokenizerInterface, WordTable
 
 tokenizer = Tokenizer()
 
@@ -17,6 +24,23 @@ def test_tokenize(arg, expected):
     result = tokenizer.tokenize(arg)
     assert result == expected
 
+def test_tokenize_traditional_does_not_affect_simplified():
+    simplified = tokenizer.tokenize('永和服装饰品有限公司')
+    tokenizer.tokenize('我來到北京清華大學', traditional=True)
+    assert tokenizer.tokenize('永和服装饰品有限公司') == simplified
+
+def test_jieba_tokenizer_is_cached():
+    assert tokenizer.jieba_tokenizer(traditional=True) is tokenizer.jieba_tokenizer(traditional=True)
+    assert tokenizer.jieba_tokenizer() is not tokenizer.jieba_tokenizer(traditional=True)
+    assert Tokenizer().jieba_tokenizer(traditional=True) is tokenizer.jieba_tokenizer(traditional=True)
+
+def test_tokenize_userdict(tmp_path):
+    userdict = tmp_path / 'userdict.txt'
+    userdict.write_text('服装饰品 100 n\n', encoding='utf-8')
+    result = tokenizer.tokenize('永和服装饰品有限公司', userdict=str(userdict))
+    assert [token[0] for token in result] == ['永和', '服装饰品', '有限公司']
+    assert tokenizer.tokenize('永和服装饰品有限公司')[1][0] == '服装'
+
 @pytest.mark.parametrize('arg, expected',
                          [('我来到北京清华大学', [('我', 'pronoun'), ('来到', 'verb'), ('北京', 'noun'), ('清华大学', 'noun')]),
                           ('？', [('？', 'punctuation mark')]),
@@ -26,6 +50,143 @@ def test_tokenize_pynlpir(arg, expected):
     result = tokenizer.tokenize(arg, using=tokenizer.pynlpir)
     assert result == expected
 
+def test_tokenize_many():
+    strings = ['永和服装饰品有限公司', '', '？']
+    assert tokenizer.tokenize_many(strings) == [tokenizer.tokenize(string) for string in strings]
+
+def test_tokenize_many_pynlpir():
+    result = tokenizer.tokenize_many(['我来到北京清华大学', ''], using=tokenizer.pynlpir)
+    assert result == [[('我', 'pronoun'), ('来到', 'verb'), ('北京', 'noun'), ('清华大学', 'noun')], []]
+
+@pytest.fixture
+def fake_pynlpir(monkeypatch):
+    calls = []
+    module = types.ModuleType('pynlpir')
+    module.open = lambda: calls.append('open')
+    module.close = lambda: calls.append('close')
+    module.segment = lambda string: [(string, 'noun')]
+    monkeypatch.setitem(sys.modules, 'pynlpir', module)
+    return calls
+
+def test_pynlpir_session_opens_once(fake_pynlpir):
+    session = PynlpirSession()
+    assert session.segment(['北京', '']) == [[('北京', 'noun')], []]
+    assert session.segment(['清华']) == [[('清华', 'noun')]]
+    assert fake_pynlpir == ['open']
+    session.close()
+    assert fake_pynlpir == ['open', 'close']
+
+def run_in_child(function):
+    """Runs function in a forked process and returns its exit status, or None if it hangs."""
+    pid = os.fork()
+    if pid == 0:
+        try:
+            status = function()
+        finally:
+            os._exit(status if isinstance(status, int) else 1)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        done, status = os.waitpid(pid, os.WNOHANG)
+        if done:
+            return os.WEXITSTATUS(status)
+        time.sleep(0.01)
+    os.kill(pid, 9)
+    os.waitpid(pid, 0)
+    return None
+
+@pytest.mark.skipif(not hasattr(os, 'register_at_fork'), reason='requires os.fork and os.register_at_fork')
+def test_pynlpir_session_reopens_in_forked_child(fake_pynlpir):
+    session = PynlpirSession()
+    session.open()
+    assert run_in_child(lambda: 0 if session.open() and fake_pynlpir == ['open', 'close', 'open'] else 1) == 0
+    assert fake_pynlpir == ['open']
+
+@pytest.mark.skipif(not hasattr(os, 'register_at_fork'), reason='requires os.fork and os.register_at_fork')
+def test_pynlpir_session_lock_is_reset_in_forked_child(fake_pynlpir, monkeypatch):
+    import chinese.tokenizer
+    session = PynlpirSession()
+    monkeypatch.setattr(chinese.tokenizer, 'pynlpir_session', session)
+    session.open()
+    acquired, release = threading.Event(), threading.Event()
+
+    def hold():
+        with session._PynlpirSession__lock:
+            acquired.set()
+            release.wait()
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    acquired.wait()
+    try:
+        assert run_in_child(lambda: 0 if session.segment(['北京']) == [[('北京', 'noun')]] else 1) == 0
+    finally:
+        release.set()
+        thread.join()
+
+words = ['研究', '研究生', '生命', '起源', '和', '和尚', '尚未', '结婚']
+matcher = MaximumMatcher(words)
+table_matcher = MaximumMatcher(tables=(WordTable(WordTable.build(words)),
+                                       WordTable(WordTable.build(words, reverse=True), reverse=True)))
+
+@pytest.mark.parametrize('arg, forward, backward, bidirectional',
+                         [('研究生命起源', ['研究生', '命', '起源'], ['研究', '生命', '起源'], ['研究', '生命', '起源']),
+                          ('结婚的和尚未结婚的', ['结婚', '的', '和尚', '未', '结婚', '的'], ['结婚', '的', '和', '尚未', '结婚', '的'], ['结婚', '的', '和', '尚未', '结婚', '的']),
+                          ('研究C++和Python', ['研究', 'C++', '和', 'Python'], ['研究', 'C++', '和', 'Python'], ['研究', 'C++', '和', 'Python']),
+                          ('', [], [], []),
+                         ])
+def test_maximum_matcher(arg, forward, backward, bidirectional):
+    assert [token[0] for token in matcher.forward(arg)] == forward
+    assert [token[0] for token in matcher.backward(arg)] == backward
+    assert [token[0] for token in matcher.bidirectional(arg)] == bidirectional
+    for method in ('forward', 'backward', 'bidirectional'):
+        assert getattr(table_matcher, method)(arg) == getattr(matcher, method)(arg)
+
+def test_maximum_matcher_switches_from_word_tables_to_dicts():
+    tables = (WordTable(WordTable.build(words)), WordTable(WordTable.build(words, reverse=True), reverse=True))
+    switching = MaximumMatcher(iter(words), tables=tables)
+    switching.switch_after = 20
+    string = '结婚的和尚未结婚的'
+    assert switching.bidirectional(string) == matcher.bidirectional(string)
+    assert isinstance(switching._MaximumMatcher__prefixes, WordTable)
+    assert switching.bidirectional(string) == matcher.bidirectional(string)
+    assert isinstance(switching._MaximumMatcher__prefixes, dict)
+    assert switching.bidirectional(string) == matcher.bidirectional(string)
+
+def test_tokenize_cedict_uses_compiled_word_tables():
+    dictionary = Dictionary()
+    dictionary.load()
+    assert dictionary.word_tables() is not None
+    string = '永和服装饰品有限公司研究生命起源'
+    expected = MaximumMatcher(dictionary.headwords()).bidirectional(string)
+    assert Tokenizer(dictionary=dictionary).tokenize(string, using=tokenizer.cedict) == expected
+
+def test_tokenize_cedict_applies_edits_to_the_matcher(tmp_path, monkeypatch):
+    source = tmp_path / 'cedict_ts.u8'
+    source.write_text('研究 研究 [yan2 jiu1] /research/\n研究生 研究生 [yan2 jiu1 sheng1] /graduate student/\n'
+                      '生命 生命 [sheng1 ming4] /life/\n起源 起源 [qi3 yuan2] /origin/\n', encoding='utf-8')
+    dictionary = Dictionary()
+    dictionary.load(str(source), cache=False)
+    edited = Tokenizer(dictionary=dictionary)
+    string = '研究生命起源'
+    assert [token for token, _, _ in edited.tokenize(string, using=tokenizer.cedict)] == ['研究', '生命', '起源']
+    monkeypatch.setattr(Dictionary, 'headwords', lambda self, **kwargs: pytest.fail('rebuilt'))
+    dictionary.add_entry('命起', '命起', ['ming4', 'qi3'], ['test'])
+    dictionary.remove_entry('起源', '起源')
+    assert [token for token, _, _ in edited.tokenize(string, using=tokenizer.cedict)] == ['研究生', '命起', '源']
+
+def test_maximum_matcher_positions():
+    string = '结婚的和尚未结婚的'
+    assert all(string[start:end] == token for token, start, end in matcher.bidirectional(string))
+
+@pytest.mark.parametrize('arg, expected, traditional',
+                         [('永和服装饰品有限公司', [('永和', 0, 2), ('服装', 2, 4), ('饰品', 4, 6), ('有限公司', 6, 10)], False),
+                          ('我來到北京清華大學', [('我', 0, 1), ('來到', 1, 3), ('北京', 3, 5), ('清華大學', 5, 9)], True),
+                          ('', [], False),
+                         ])
+def test_tokenize_cedict(arg, expected, traditional):
+    result = tokenizer.tokenize(arg, traditional=traditional, using=tokenizer.cedict)
+    assert result == expected
+
 def test_custom_tokenizer_works():
     class MyTokenizer(TokenizerInterface):
         def tokenize(self, string):